@@ -1,10 +1,9 @@
 import requests
 from scrapy import Selector
 import json
-from pymongo import MongoClient
+from helper import get_database
 
-client = MongoClient('mongodb://localhost:27017')
-db = client['betting']
+db = get_database()
 get_collection = db['ots']
 all_mapping_data = list(get_collection.find())
 url = 'https://d-cf.betsmithplayground.net/stc-1533379659/stc-1533379659'
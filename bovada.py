@@ -2,12 +2,13 @@ import json
 import scrapy
 import re
 from datetime import datetime, timezone
-from pymongo import MongoClient, UpdateOne
 from scrapy.crawler import CrawlerProcess
 from helper import (remove_empty_dicts,
-    check_sport_name, parse_tipico_date, normalize_timestamp_for_comparison,
-    compare_matchups, check_key, check_header_name, setup_scraper_logger,
-    log_scraper_progress, execute_bulk_write_operations
+    check_sport_name, parse_tipico_date,
+    check_key, setup_scraper_logger,
+    log_scraper_progress, get_mapping_snapshot_service, MarketClassificationCache,
+    normalize_bookmaker_sport, canonical_sport_id, TeamNameAnonymizer, FixtureMatcher, PriceHashCache,
+    fixture_price_update, get_staged_events_collection, staged_event_update, get_database, BackgroundBulkWriter
 )
 
 
@@ -38,42 +39,47 @@ class BovadaOddsSpider(scrapy.Spider):
         "x-channel": "desktop"
     }
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, staged=0, kickoff_tolerance=None, *args, **kwargs):
+        super().__init__(*args, **kwargs)
 
         # Initialize logger
         self.custom_logger = setup_scraper_logger('bovada')
         log_scraper_progress(self.custom_logger, 'INIT', 'Initializing Bovada scraper')
 
         # Database connection
-        mongodb_client = MongoClient(
-            'mongodb://localhost:27017/',
-            maxPoolSize=50,  # Increase pool size
-            minPoolSize=10,  # Keep minimum connections
-            maxIdleTimeMS=30000,  # Keep connections alive longer
-            serverSelectionTimeoutMS=10000,  # 10 second timeout
-            connectTimeoutMS=10000,
-            socketTimeoutMS=0,  # No socket timeout (important!)
-            waitQueueTimeoutMS=10000,
-            retryWrites=True,
-            heartbeatFrequencyMS=10000  # Check connection every 10s
-        )
-        betting_database = mongodb_client['betting']
-
-        # Load mapping data
-        odds_mapping_collection = betting_database['ots']
-        self.odds_type_mappings = list(odds_mapping_collection.find())
+        betting_database = get_database()
 
-        country_collection = betting_database['cos']
-        self.country_data = list(country_collection.find())
+        # Mapping data (`ots`, `cos`) is shared by every spider in the process and refreshed in the background
+        self.mapping_snapshots = get_mapping_snapshot_service(betting_database, self.custom_logger)
+        self.market_classifications = MarketClassificationCache(
+            betting_database['market_classifications'], 'bovada',
+            self.mapping_snapshots, self.custom_logger
+        )
 
         # Matches collection for updates
         self.matches_collection = betting_database['matches_data']
 
+        # Staged mode writes normalized events to the staging collection, reconcile.py matches them
+        self.stage_events = int(staged)
+        self.crawl_started_at = datetime.now(timezone.utc)
+        if self.stage_events:
+            self.fixture_matcher = None
+            self.price_hashes = None
+            self.bulk_update_collection = get_staged_events_collection(betting_database)
+        else:
+            # `-a kickoff_tolerance=<seconds>` overrides the bookmaker's KICKOFF_TOLERANCE_SECONDS_BY_BOOKMAKER entry
+            self.fixture_matcher = FixtureMatcher(
+                betting_database, 'bovada', self.custom_logger,
+                kickoff_tolerance_seconds=int(kickoff_tolerance) if kickoff_tolerance else None
+            )
+            self.price_hashes = PriceHashCache(self.matches_collection, 'bovada', self.custom_logger)
+            self.bulk_update_collection = self.matches_collection
+
         # Collections for storing processed data
         self.processed_matches = []
         self.unique_odds_keys = set()
         self.bulk_update_operations = []
+        self.bulk_writer = BackgroundBulkWriter(self.bulk_update_collection, "bovada_updates", self.custom_logger)
         self.current_sport_name = ''
 
         # Proxy configuration
@@ -84,9 +90,11 @@ class BovadaOddsSpider(scrapy.Spider):
         self.successful_matches = 0
         self.failed_matches = 0
 
+        mapping_snapshot = self.mapping_snapshots.snapshot
         log_scraper_progress(
             self.custom_logger, 'INIT_COMPLETE',
-            f'Loaded {len(self.odds_type_mappings)} odds mappings, {len(self.country_data)} countries'
+            f'Loaded {len(mapping_snapshot.odds_type_mappings)} odds mappings, '
+            f'{len(mapping_snapshot.country_data)} countries'
         )
 
     def start_requests(self):
@@ -323,7 +331,7 @@ class BovadaOddsSpider(scrapy.Spider):
                 return
 
             # Determine sport name
-            sport_name = self._normalize_sport_name(league_data['path'][-1]['description'])
+            sport_name = normalize_bookmaker_sport(league_data['path'][-1]['description'], 'bovada')
 
             # Determine country and group
             if len(league_data['path']) == 2:
@@ -345,8 +353,10 @@ class BovadaOddsSpider(scrapy.Spider):
                 'competitor1': competitor1_name,
                 'competitor2': competitor2_name,
                 'sport': sport_name,
+                'sport_id': canonical_sport_id(sport_name),
                 "timestamp": parsed_match_datetime,
                 'country': country_name,
+                'country_id': self.mapping_snapshots.snapshot.country_index.resolve(country_name),
                 'group': group_name,
                 'bovada_match_id':str(match_info['id']),
                 'odds': {}
@@ -360,9 +370,15 @@ class BovadaOddsSpider(scrapy.Spider):
             short_name_team1 = match_info['competitors'][0].get('shortName', '').strip()
             short_name_team2 = match_info['competitors'][1].get('shortName', '').strip()
 
+            # Compile the team name substitution once for every label of this event
+            team_name_anonymizer = TeamNameAnonymizer(
+                [competitor1_name, short_name_team1, description_team1],
+                [competitor2_name, short_name_team2, description_team2]
+            )
+
             # Process odds data
             self._extract_odds_from_match(
-                match_info, match_information,
+                match_info, match_information, team_name_anonymizer,
                 description_team1, description_team2,
                 short_name_team1, short_name_team2
             )
@@ -391,20 +407,14 @@ class BovadaOddsSpider(scrapy.Spider):
                 error=match_error
             )
 
-    def _normalize_sport_name(self, sport_name):
-        """Normalize sport names to standard format"""
-        if sport_name.lower() == 'football':
-            return 'handball'
-        else:
-            return sport_name
-
     def _convert_timestamp(self, timestamp_milliseconds):
         """Convert timestamp from milliseconds to GMT string format"""
         datetime_object = datetime.fromtimestamp(timestamp_milliseconds / 1000, tz=timezone.utc)
         gmt_string = datetime_object.strftime('%d %b %Y %H:%M:%S GMT')
         return gmt_string
 
-    def _extract_odds_from_match(self, match_info, match_data, desc_team1, desc_team2, short_team1, short_team2):
+    def _extract_odds_from_match(self, match_info, match_data, team_name_anonymizer, desc_team1, desc_team2,
+                                 short_team1, short_team2):
         """Extract odds information from match display groups"""
         for display_group in match_info['displayGroups']:
             if 'props' in display_group['description'].lower():
@@ -416,25 +426,20 @@ class BovadaOddsSpider(scrapy.Spider):
 
                 # Process market name
                 market_name = self._process_market_name(
-                    market_info, match_data, desc_team1, desc_team2, short_team1, short_team2
+                    market_info, team_name_anonymizer
                 )
 
                 if not market_name:
                     continue
 
-                # Check if market is valid
-                if not self._is_valid_market(market_name):
+                # Filter, map and categorize the market (cached per label across runs)
+                market_classification = self.market_classifications.classify(market_name, self._is_valid_market)
+                if not market_classification.valid:
                     continue
 
-                # Get mapping data
-                mapping_result = self._get_odds_mapping_data(market_name)
-                odds_value_mappings = mapping_result[0]
-                standardized_market_name = mapping_result[1]
-
-                # Get header categorization
-                header_result = check_header_name(standardized_market_name)
-                market_header_category = header_result[0]
-                final_market_name = header_result[1]
+                odds_value_mappings = market_classification.ovs
+                market_header_category = market_classification.header
+                final_market_name = market_classification.final_key
 
                 self.unique_odds_keys.add(final_market_name)
 
@@ -445,14 +450,12 @@ class BovadaOddsSpider(scrapy.Spider):
                 # Process outcomes based on count
                 self._process_market_outcomes(
                     market_info, match_data, market_header_category, final_market_name,
-                    odds_value_mappings, desc_team1, desc_team2, short_team1, short_team2
+                    odds_value_mappings, team_name_anonymizer, desc_team1, desc_team2, short_team1, short_team2
                 )
 
-    def _process_market_name(self, market_info, match_data, desc_team1, desc_team2, short_team1, short_team2):
+    def _process_market_name(self, market_info, team_name_anonymizer):
         """Process and normalize market name"""
-        market_name = market_info["description"].replace(
-            match_data['competitor1'], 'home'
-        ).replace(match_data['competitor2'], 'away')
+        market_name = team_name_anonymizer.anonymize(market_info["description"])
 
         # Skip certain market types
         if 'o/u' in market_name.lower() and '-' in market_name.lower():
@@ -461,12 +464,8 @@ class BovadaOddsSpider(scrapy.Spider):
         # Handle period-specific markets
         if 'period' in market_info:
             if market_info['period']['description'] != 'Regulation Time':
-                market_name = market_name + ' - ' + market_info['period']["description"]
-
-        # Replace various team name formats
-        market_name = market_name.replace(match_data['competitor1'], 'home').replace(match_data['competitor2'], 'away')
-        market_name = market_name.replace(short_team1, 'home').replace(short_team2, 'away')
-        market_name = market_name.replace(desc_team1, 'home').replace(desc_team2, 'away')
+                period_description = team_name_anonymizer.anonymize(market_info['period']["description"])
+                market_name = market_name + ' - ' + period_description
 
         return market_name
 
@@ -487,7 +486,8 @@ class BovadaOddsSpider(scrapy.Spider):
         return check_key(market_name)
 
     def _process_market_outcomes(self, market_info, match_data, header_category, market_name,
-                                 value_mappings, desc_team1, desc_team2, short_team1, short_team2):
+                                 value_mappings, team_name_anonymizer, desc_team1, desc_team2,
+                                 short_team1, short_team2):
         """Process market outcomes based on number of outcomes"""
         outcomes_list = market_info['outcomes']
 
@@ -497,29 +497,26 @@ class BovadaOddsSpider(scrapy.Spider):
         if len(outcomes_list) == 2:
             self._process_two_outcome_market(
                 outcomes_list, match_data, header_category, market_name,
-                value_mappings, desc_team1, desc_team2, short_team1, short_team2
+                value_mappings, team_name_anonymizer, desc_team1, desc_team2, short_team1, short_team2
             )
         elif len(outcomes_list) == 3:
             self._process_three_outcome_market(
                 outcomes_list, match_data, header_category, market_name,
-                value_mappings, desc_team1, desc_team2, short_team1, short_team2
+                value_mappings, team_name_anonymizer, desc_team1, desc_team2, short_team1, short_team2
             )
         else:
             self._process_multiple_outcome_market(
                 outcomes_list, market_info, match_data, header_category, market_name,
-                value_mappings, desc_team1, desc_team2, short_team1, short_team2
+                value_mappings, team_name_anonymizer
             )
 
     def _process_two_outcome_market(self, outcomes, match_data, header_category, market_name,
-                                         value_mappings, desc_team1, desc_team2, short_team1, short_team2):
+                                         value_mappings, team_name_anonymizer, desc_team1, desc_team2,
+                                         short_team1, short_team2):
         """Process live market with exactly 2 outcomes"""
-        outcome1_description = outcomes[0]['description'].replace(
-            match_data['competitor1'], 'home'
-        ).replace(match_data['competitor2'], 'away').strip()
+        outcome1_description = team_name_anonymizer.anonymize(outcomes[0]['description']).strip()
 
-        outcome2_description = outcomes[1]['description'].replace(
-            match_data['competitor1'], 'home'
-        ).replace(match_data['competitor2'], 'away').strip()
+        outcome2_description = team_name_anonymizer.anonymize(outcomes[1]['description']).strip()
 
         # Map team names to standard format
         outcome1_mapped = self._map_competitor_name(
@@ -541,22 +538,17 @@ class BovadaOddsSpider(scrapy.Spider):
         }
 
     def _process_three_outcome_market(self, outcomes, match_data, header_category, market_name,
-                                           value_mappings, desc_team1, desc_team2, short_team1, short_team2):
+                                           value_mappings, team_name_anonymizer, desc_team1, desc_team2,
+                                           short_team1, short_team2):
         """Process live market with exactly 3 outcomes"""
         # Get handicap value
         handicap_value = self._extract_handicap_value(outcomes[0])
 
-        outcome1_description = outcomes[0]['description'].replace(
-            match_data['competitor1'], 'home'
-        ).replace(match_data['competitor2'], 'away').strip()
+        outcome1_description = team_name_anonymizer.anonymize(outcomes[0]['description']).strip()
 
-        outcome2_description = outcomes[1]['description'].replace(
-            match_data['competitor1'], 'home'
-        ).replace(match_data['competitor2'], 'away').strip()
+        outcome2_description = team_name_anonymizer.anonymize(outcomes[1]['description']).strip()
 
-        outcome3_description = outcomes[2]['description'].replace(
-            match_data['competitor1'], 'home'
-        ).replace(match_data['competitor2'], 'away').strip()
+        outcome3_description = team_name_anonymizer.anonymize(outcomes[2]['description']).strip()
 
         # Map team names
         outcome1_mapped = self._map_competitor_name(
@@ -577,16 +569,10 @@ class BovadaOddsSpider(scrapy.Spider):
         }
 
     def _process_multiple_outcome_market(self, outcomes, market_info, match_data, header_category,
-                                              market_name, value_mappings, desc_team1, desc_team2,
-                                              short_team1, short_team2):
+                                              market_name, value_mappings, team_name_anonymizer):
         """Process live market with multiple outcomes"""
         for individual_outcome in outcomes:
-            competitor_name = individual_outcome["description"].replace(
-                match_data['competitor1'], 'home'
-            ).replace(match_data['competitor2'], 'away')
-
-            competitor_name = competitor_name.replace(short_team1, 'home').replace(short_team2, 'away')
-            competitor_name = competitor_name.replace(desc_team1, 'home').replace(desc_team2, 'away')
+            competitor_name = team_name_anonymizer.anonymize(individual_outcome["description"])
             competitor_name = self._apply_value_mapping(competitor_name, value_mappings)
 
             # Handle period-specific outcomes for live matches
@@ -627,25 +613,20 @@ class BovadaOddsSpider(scrapy.Spider):
 
     def _apply_value_mapping(self, competitor_name, value_mappings):
         """Apply value mappings if available"""
-        if 'home' in competitor_name.lower():
+        competitor_name_lower = competitor_name.lower()
+        if 'home' in competitor_name_lower:
             return '1'
-        elif 'away' in competitor_name.lower():
+        elif 'away' in competitor_name_lower:
             return '2'
-        elif 'tie' in competitor_name.lower():
+        elif 'tie' in competitor_name_lower:
             return 'x'
-        elif 'under' in competitor_name.lower():
+        elif 'under' in competitor_name_lower:
             return '-'
-        elif 'over' in competitor_name.lower():
+        elif 'over' in competitor_name_lower:
             return '+'
 
         if value_mappings:
-            for mapping_entry in value_mappings:
-                if mapping_entry['id'] == competitor_name:
-                    return mapping_entry['id']
-                elif ('maps' in mapping_entry and
-                      (any(competitor_name.lower() in word.strip('[]') for word in mapping_entry['maps']) or
-                       any(word.strip('[]') in competitor_name.lower() for word in mapping_entry['maps']))):
-                    return mapping_entry['id']
+            return self.mapping_snapshots.snapshot.odds_mapping_resolver.value_matcher(value_mappings).match(competitor_name)
 
         return competitor_name
 
@@ -675,70 +656,29 @@ class BovadaOddsSpider(scrapy.Spider):
             return '0'
 
     def _match_with_flashscore_data(self, bovada_match_info):
-        """Match bovada data with flashscore data and prepare bulk update"""
-        normalized_bovada_timestamp = normalize_timestamp_for_comparison(bovada_match_info['timestamp'])
-        bovada_sport_normalized = (bovada_match_info['sport'].lower()
-                                   .replace('-', '').replace(' ', ''))
-
-        # Query database for potential matches instead of loading all into memory
-        potential_matches_cursor = self.matches_collection.find({
-            "timestamp": normalized_bovada_timestamp,
-        })
-
-        for flashscore_match in potential_matches_cursor:
-            # Check sport compatibility
-            flashscore_sport_normalized = (flashscore_match['sport']
-                                           .replace('-', '').replace(' ', ''))
-
-            sport_matches = bovada_sport_normalized == flashscore_sport_normalized
-
-            if sport_matches:
-                matchup_compatibility = compare_matchups(
-                    flashscore_match['competitor1'].lower(),
-                    flashscore_match['competitor2'].lower(),
-                    bovada_match_info['competitor1'].lower(),
-                    bovada_match_info['competitor2'].lower()
-                )
-
-                if matchup_compatibility:
-                    # Prepare bulk update operation
-                    update_operation = UpdateOne(
-                        {"match_id": flashscore_match["match_id"]},
-                        {"$set": {"prices.bovada": bovada_match_info['odds'],
-                                  'bovada_match_id':bovada_match_info['bovada_match_id']
-                                  }}
-                    )
-                    self.bulk_update_operations.append(update_operation)
-
-                    log_scraper_progress(
-                        self.custom_logger, 'MATCH_FOUND',
-                        f'Matched {bovada_match_info["competitor1"]} vs {bovada_match_info["competitor2"]}'
-                    )
-                    break
+        """Stage bovada data for reconcile.py, or match it with flashscore data and prepare bulk updates"""
+        if self.stage_events:
+            self.bulk_update_operations.append(staged_event_update(
+                'bovada', bovada_match_info['bovada_match_id'], bovada_match_info, bovada_match_info['odds'],
+                self.crawl_started_at
+            ))
+            return
 
-    def _get_odds_mapping_data(self, odds_key):
-        """Get mapping data for odds key from MongoDB"""
-        odds_value_mappings = None
-        standardized_key = odds_key
+        self.fixture_matcher.add(bovada_match_info['bovada_match_id'], bovada_match_info)
+        self._prepare_match_updates()
 
-        for mapping_entry in self.odds_type_mappings:
-            try:
-                if odds_key.lower() == mapping_entry['id']:
-                    standardized_key = mapping_entry['id']
-                    odds_value_mappings = mapping_entry.get('ovs')
-                    break
-                elif 'maps' in mapping_entry and odds_key.lower() in mapping_entry['maps']:
-                    standardized_key = mapping_entry['id']
-                    odds_value_mappings = mapping_entry.get('ovs')
-                    break
-            except Exception as mapping_error:
-                log_scraper_progress(
-                    self.custom_logger, 'MAPPING_ERROR',
-                    f'Error in odds mapping: {mapping_error}',
-                    error=mapping_error
-                )
+    def _prepare_match_updates(self):
+        """Prepare the bulk updates writing bovada prices to the matched flashscore fixtures"""
+        for event_id, bovada_match_info, flashscore_match in self.fixture_matcher.pop_matched():
+            # Unchanged prices are not written again
+            self.bulk_update_operations.extend(fixture_price_update(
+                'bovada', event_id, bovada_match_info['odds'], flashscore_match, self.price_hashes
+            ))
 
-        return [odds_value_mappings, standardized_key]
+            log_scraper_progress(
+                self.custom_logger, 'MATCH_FOUND',
+                f'Matched {bovada_match_info["competitor1"]} vs {bovada_match_info["competitor2"]}'
+            )
 
     def _process_bulk_updates_if_needed(self):
         """Process bulk updates if batch size is reached"""
@@ -751,12 +691,8 @@ class BovadaOddsSpider(scrapy.Spider):
             return
 
         try:
-            bulk_result = execute_bulk_write_operations(
-                self.matches_collection,
-                self.bulk_update_operations,
-                "bovada_updates",
-                self.custom_logger
-            )
+            # Written by the background writer thread, the callback doesn't wait for Mongo
+            self.bulk_writer.submit(self.bulk_update_operations)
 
             self.bulk_update_operations = []  # Clear operations list
 
@@ -782,13 +718,20 @@ class BovadaOddsSpider(scrapy.Spider):
     def close(self, reason):
         """Final cleanup and bulk update execution"""
         try:
-            # Execute any remaining bulk operations
-            if self.bulk_update_operations:
-                log_scraper_progress(
-                    self.custom_logger, 'FINAL_BULK_UPDATE',
-                    f'Executing final {len(self.bulk_update_operations)} bulk operations'
-                )
-                self._execute_bulk_updates()
+            try:
+                # Match events still waiting for a batch, then execute any remaining bulk operations
+                if self.fixture_matcher is not None:
+                    self.fixture_matcher.close()
+                    self._prepare_match_updates()
+                if self.bulk_update_operations:
+                    log_scraper_progress(
+                        self.custom_logger, 'FINAL_BULK_UPDATE',
+                        f'Executing final {len(self.bulk_update_operations)} bulk operations'
+                    )
+                    self._execute_bulk_updates()
+            finally:
+                # Writes already queued are flushed even when the final matching fails
+                self.bulk_writer.close()
 
             log_scraper_progress(
                 self.custom_logger, 'SCRAPER_COMPLETED',
@@ -802,6 +745,16 @@ class BovadaOddsSpider(scrapy.Spider):
                 f'Failed: {self.failed_matches}, Unique odds: {len(self.unique_odds_keys)}'
             )
 
+            self.market_classifications.flush()
+            log_scraper_progress(
+                self.custom_logger, 'MARKET_CACHE_STATS',
+                f'Market classifications - Hits: {self.market_classifications.hits}, '
+                f'Misses: {self.market_classifications.misses}'
+            )
+            if self.fixture_matcher is not None:
+                self.fixture_matcher.log_stats()
+                self.price_hashes.log_stats()
+
         except Exception as cleanup_error:
             log_scraper_progress(
                 self.custom_logger, 'CLEANUP_ERROR',
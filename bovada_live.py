@@ -2,11 +2,13 @@ import json
 import scrapy
 import re
 from datetime import datetime, timezone
-from pymongo import MongoClient, UpdateOne
+from pymongo import UpdateOne
 from scrapy.crawler import CrawlerProcess
 from helper import (remove_empty_dicts,
-    check_sport_name, compare_matchups, check_key, check_header_name,
-    setup_scraper_logger, log_scraper_progress, execute_bulk_write_operations,normalize_timestamp_for_comparison,parse_tipico_date
+    check_sport_name, compare_matchups, check_key,
+    setup_scraper_logger, log_scraper_progress, get_mapping_snapshot_service, MarketClassificationCache,
+    normalize_bookmaker_sport, canonical_sport_id, TeamNameAnonymizer, normalize_timestamp_for_comparison,parse_tipico_date,
+    get_database, BackgroundBulkWriter, price_hashes_reset
 )
 
 
@@ -45,26 +47,14 @@ class BovadaLiveOddsSpider(scrapy.Spider):
         log_scraper_progress(self.custom_logger, 'INIT', 'Initializing Bovada Live scraper')
 
         # Database connection
-        mongodb_client = MongoClient(
-            'mongodb://localhost:27017/',
-            maxPoolSize=50,  # Increase pool size
-            minPoolSize=10,  # Keep minimum connections
-            maxIdleTimeMS=30000,  # Keep connections alive longer
-            serverSelectionTimeoutMS=10000,  # 10 second timeout
-            connectTimeoutMS=10000,
-            socketTimeoutMS=0,  # No socket timeout (important!)
-            waitQueueTimeoutMS=10000,
-            retryWrites=True,
-            heartbeatFrequencyMS=10000  # Check connection every 10s
-        )
-        betting_database = mongodb_client['betting']
-
-        # Load mapping data
-        odds_mapping_collection = betting_database['ots']
-        self.odds_type_mappings = list(odds_mapping_collection.find())
+        betting_database = get_database()
 
-        country_collection = betting_database['cos']
-        self.country_data = list(country_collection.find())
+        # Mapping data (`ots`, `cos`) is shared by every spider in the process and refreshed in the background
+        self.mapping_snapshots = get_mapping_snapshot_service(betting_database, self.custom_logger)
+        self.market_classifications = MarketClassificationCache(
+            betting_database['market_classifications'], 'bovada',
+            self.mapping_snapshots, self.custom_logger
+        )
 
         # Matches collection for updates
         self.matches_collection = betting_database['matches_data']
@@ -73,6 +63,7 @@ class BovadaLiveOddsSpider(scrapy.Spider):
         self.processed_live_matches = []
         self.unique_odds_keys = set()
         self.bulk_update_operations = []
+        self.bulk_writer = BackgroundBulkWriter(self.matches_collection, "bovada_live_updates", self.custom_logger)
         self.current_sport_name = ''
 
         # Proxy configuration
@@ -83,9 +74,10 @@ class BovadaLiveOddsSpider(scrapy.Spider):
         self.successful_live_matches = 0
         self.failed_live_matches = 0
 
+        mapping_snapshot = self.mapping_snapshots.snapshot
         log_scraper_progress(
             self.custom_logger, 'INIT_COMPLETE',
-            f'Loaded {len(self.odds_type_mappings)} odds mappings for live matches'
+            f'Loaded {len(mapping_snapshot.odds_type_mappings)} odds mappings for live matches'
         )
 
     def start_requests(self):
@@ -323,7 +315,7 @@ class BovadaLiveOddsSpider(scrapy.Spider):
                 return
 
             # Determine sport name
-            sport_name = self._normalize_sport_name(league_data['path'][-1]['description'])
+            sport_name = normalize_bookmaker_sport(league_data['path'][-1]['description'], 'bovada')
 
             # Determine country and group
             if len(league_data['path']) == 2:
@@ -345,7 +337,9 @@ class BovadaLiveOddsSpider(scrapy.Spider):
                 'competitor1': competitor1_name,
                 'competitor2': competitor2_name,
                 'sport': sport_name,
+                'sport_id': canonical_sport_id(sport_name),
                 'country': country_name,
+                'country_id': self.mapping_snapshots.snapshot.country_index.resolve(country_name),
                 "timestamp": parsed_match_datetime,
                 'group': group_name,
                 'bovada_match_id': str(live_match_info['id']),
@@ -361,9 +355,15 @@ class BovadaLiveOddsSpider(scrapy.Spider):
             short_name_team1 = live_match_info['competitors'][0].get('shortName', '').strip()
             short_name_team2 = live_match_info['competitors'][1].get('shortName', '').strip()
 
+            # Compile the team name substitution once for every label of this event
+            team_name_anonymizer = TeamNameAnonymizer(
+                [competitor1_name, short_name_team1, description_team1],
+                [competitor2_name, short_name_team2, description_team2]
+            )
+
             # Process live odds data
             self._extract_odds_from_live_match(
-                live_match_info, live_match_information,
+                live_match_info, live_match_information, team_name_anonymizer,
                 description_team1, description_team2,
                 short_name_team1, short_name_team2
             )
@@ -397,15 +397,9 @@ class BovadaLiveOddsSpider(scrapy.Spider):
         datetime_object = datetime.fromtimestamp(timestamp_milliseconds / 1000, tz=timezone.utc)
         gmt_string = datetime_object.strftime('%d %b %Y %H:%M:%S GMT')
         return gmt_string
-    def _normalize_sport_name(self, sport_name):
-        """Normalize sport names to standard format"""
-        if sport_name.lower() == 'football':
-            return 'handball'
-        else:
-            return sport_name
 
-    def _extract_odds_from_live_match(self, live_match_info, match_data, desc_team1, desc_team2, short_team1,
-                                      short_team2):
+    def _extract_odds_from_live_match(self, live_match_info, match_data, team_name_anonymizer, desc_team1,
+                                      desc_team2, short_team1, short_team2):
         """Extract odds information from LIVE match display groups"""
         for display_group in live_match_info['displayGroups']:
             if 'props' in display_group['description'].lower():
@@ -417,25 +411,20 @@ class BovadaLiveOddsSpider(scrapy.Spider):
 
                 # Process market name for live matches
                 market_name = self._process_live_market_name(
-                    market_info, match_data, desc_team1, desc_team2, short_team1, short_team2
+                    market_info, team_name_anonymizer
                 )
 
                 if not market_name:
                     continue
 
-                # Check if market is valid
-                if not self._is_valid_market(market_name):
+                # Filter, map and categorize the market (cached per label across runs)
+                market_classification = self.market_classifications.classify(market_name, self._is_valid_market)
+                if not market_classification.valid:
                     continue
 
-                # Get mapping data
-                mapping_result = self._get_odds_mapping_data(market_name)
-                odds_value_mappings = mapping_result[0]
-                standardized_market_name = mapping_result[1]
-
-                # Get header categorization
-                header_result = check_header_name(standardized_market_name)
-                market_header_category = header_result[0]
-                final_market_name = header_result[1]
+                odds_value_mappings = market_classification.ovs
+                market_header_category = market_classification.header
+                final_market_name = market_classification.final_key
 
                 self.unique_odds_keys.add(final_market_name)
 
@@ -446,14 +435,12 @@ class BovadaLiveOddsSpider(scrapy.Spider):
                 # Process outcomes based on count
                 self._process_live_market_outcomes(
                     market_info, match_data, market_header_category, final_market_name,
-                    odds_value_mappings, desc_team1, desc_team2, short_team1, short_team2
+                    odds_value_mappings, team_name_anonymizer, desc_team1, desc_team2, short_team1, short_team2
                 )
 
-    def _process_live_market_name(self, market_info, match_data, desc_team1, desc_team2, short_team1, short_team2):
+    def _process_live_market_name(self, market_info, team_name_anonymizer):
         """Process and normalize live market name"""
-        market_name = market_info["description"].replace(
-            match_data['competitor1'], 'home'
-        ).replace(match_data['competitor2'], 'away')
+        market_name = team_name_anonymizer.anonymize(market_info["description"])
 
         # Skip certain market types
         if 'o/u' in market_name.lower() and '-' in market_name.lower():
@@ -467,15 +454,10 @@ class BovadaLiveOddsSpider(scrapy.Spider):
             else:
                 # Remove 'Live ' prefix from period description
                 period_description = market_info['period']["description"].replace('Live ', '')
-                market_name = market_name + ' - ' + period_description
+                market_name = market_name + ' - ' + team_name_anonymizer.anonymize(period_description)
         if ' - extra time' in market_name.lower() and ' including extra time' in market_name.lower():
             market_name = market_name.replace(' - extra time', '').replace(' including extra time', '')
 
-        # Replace various team name formats
-        market_name = market_name.replace(match_data['competitor1'], 'home').replace(match_data['competitor2'], 'away')
-        market_name = market_name.replace(short_team1, 'home').replace(short_team2, 'away')
-        market_name = market_name.replace(desc_team1, 'home').replace(desc_team2, 'away')
-
         return market_name
 
     def _is_valid_market(self, market_name):
@@ -494,7 +476,8 @@ class BovadaLiveOddsSpider(scrapy.Spider):
         return check_key(market_name)
 
     def _process_live_market_outcomes(self, market_info, match_data, header_category, market_name,
-                                      value_mappings, desc_team1, desc_team2, short_team1, short_team2):
+                                      value_mappings, team_name_anonymizer, desc_team1, desc_team2,
+                                      short_team1, short_team2):
         """Process live market outcomes based on number of outcomes"""
         outcomes_list = market_info['outcomes']
 
@@ -504,29 +487,26 @@ class BovadaLiveOddsSpider(scrapy.Spider):
         if len(outcomes_list) == 2:
             self._process_two_outcome_live_market(
                 outcomes_list, match_data, header_category, market_name,
-                value_mappings, desc_team1, desc_team2, short_team1, short_team2
+                value_mappings, team_name_anonymizer, desc_team1, desc_team2, short_team1, short_team2
             )
         elif len(outcomes_list) == 3:
             self._process_three_outcome_live_market(
                 outcomes_list, match_data, header_category, market_name,
-                value_mappings, desc_team1, desc_team2, short_team1, short_team2
+                value_mappings, team_name_anonymizer, desc_team1, desc_team2, short_team1, short_team2
             )
         else:
             self._process_multiple_outcome_live_market(
                 outcomes_list, market_info, match_data, header_category, market_name,
-                value_mappings, desc_team1, desc_team2, short_team1, short_team2
+                value_mappings, team_name_anonymizer
             )
 
     def _process_two_outcome_live_market(self, outcomes, match_data, header_category, market_name,
-                                         value_mappings, desc_team1, desc_team2, short_team1, short_team2):
+                                         value_mappings, team_name_anonymizer, desc_team1, desc_team2,
+                                         short_team1, short_team2):
         """Process live market with exactly 2 outcomes"""
-        outcome1_description = outcomes[0]['description'].replace(
-            match_data['competitor1'], 'home'
-        ).replace(match_data['competitor2'], 'away').strip()
+        outcome1_description = team_name_anonymizer.anonymize(outcomes[0]['description']).strip()
 
-        outcome2_description = outcomes[1]['description'].replace(
-            match_data['competitor1'], 'home'
-        ).replace(match_data['competitor2'], 'away').strip()
+        outcome2_description = team_name_anonymizer.anonymize(outcomes[1]['description']).strip()
 
         # Map team names to standard format
         outcome1_mapped = self._map_competitor_name(
@@ -548,22 +528,17 @@ class BovadaLiveOddsSpider(scrapy.Spider):
         }
 
     def _process_three_outcome_live_market(self, outcomes, match_data, header_category, market_name,
-                                           value_mappings, desc_team1, desc_team2, short_team1, short_team2):
+                                           value_mappings, team_name_anonymizer, desc_team1, desc_team2,
+                                           short_team1, short_team2):
         """Process live market with exactly 3 outcomes"""
         # Get handicap value
         handicap_value = self._extract_handicap_value(outcomes[0])
 
-        outcome1_description = outcomes[0]['description'].replace(
-            match_data['competitor1'], 'home'
-        ).replace(match_data['competitor2'], 'away').strip()
+        outcome1_description = team_name_anonymizer.anonymize(outcomes[0]['description']).strip()
 
-        outcome2_description = outcomes[1]['description'].replace(
-            match_data['competitor1'], 'home'
-        ).replace(match_data['competitor2'], 'away').strip()
+        outcome2_description = team_name_anonymizer.anonymize(outcomes[1]['description']).strip()
 
-        outcome3_description = outcomes[2]['description'].replace(
-            match_data['competitor1'], 'home'
-        ).replace(match_data['competitor2'], 'away').strip()
+        outcome3_description = team_name_anonymizer.anonymize(outcomes[2]['description']).strip()
 
         # Map team names
         outcome1_mapped = self._map_competitor_name(
@@ -584,16 +559,10 @@ class BovadaLiveOddsSpider(scrapy.Spider):
         }
 
     def _process_multiple_outcome_live_market(self, outcomes, market_info, match_data, header_category,
-                                              market_name, value_mappings, desc_team1, desc_team2,
-                                              short_team1, short_team2):
+                                              market_name, value_mappings, team_name_anonymizer):
         """Process live market with multiple outcomes"""
         for individual_outcome in outcomes:
-            competitor_name = individual_outcome["description"].replace(
-                match_data['competitor1'], 'home'
-            ).replace(match_data['competitor2'], 'away')
-
-            competitor_name = competitor_name.replace(short_team1, 'home').replace(short_team2, 'away')
-            competitor_name = competitor_name.replace(desc_team1, 'home').replace(desc_team2, 'away')
+            competitor_name = team_name_anonymizer.anonymize(individual_outcome["description"])
             competitor_name = self._apply_value_mapping(competitor_name, value_mappings)
 
             # Handle period-specific outcomes for live matches
@@ -634,25 +603,20 @@ class BovadaLiveOddsSpider(scrapy.Spider):
 
     def _apply_value_mapping(self, competitor_name, value_mappings):
         """Apply value mappings if available"""
-        if 'home' in competitor_name.lower():
+        competitor_name_lower = competitor_name.lower()
+        if 'home' in competitor_name_lower:
             return '1'
-        elif 'away' in competitor_name.lower():
+        elif 'away' in competitor_name_lower:
             return '2'
-        elif 'tie' in competitor_name.lower():
+        elif 'tie' in competitor_name_lower:
             return 'x'
-        elif 'under' in competitor_name.lower():
+        elif 'under' in competitor_name_lower:
             return '-'
-        elif 'over' in competitor_name.lower():
+        elif 'over' in competitor_name_lower:
             return '+'
 
         if value_mappings:
-            for mapping_entry in value_mappings:
-                if mapping_entry['id'] == competitor_name:
-                    return mapping_entry['id']
-                elif ('maps' in mapping_entry and
-                      (any(competitor_name.lower() in word.strip('[]') for word in mapping_entry['maps']) or
-                       any(word.strip('[]') in competitor_name.lower() for word in mapping_entry['maps']))):
-                    return mapping_entry['id']
+            return self.mapping_snapshots.snapshot.odds_mapping_resolver.value_matcher(value_mappings).match(competitor_name)
 
         return competitor_name
 
@@ -734,6 +698,8 @@ class BovadaLiveOddsSpider(scrapy.Spider):
                 {"match_id": flashscore_match["match_id"]},
                 {"$set": {
                     "prices.bovada": bovada_live_match_info['odds'],
+                    # Prices are replaced whole, the next prematch write must not diff against stale hashes
+                    **price_hashes_reset('bovada'),
                     # Optionally update status to live if needed
                     # "status": "live"
                 }}
@@ -745,31 +711,6 @@ class BovadaLiveOddsSpider(scrapy.Spider):
                 f'Matched LIVE {bovada_live_match_info["competitor1"]} vs {bovada_live_match_info["competitor2"]}'
             )
 
-
-    def _get_odds_mapping_data(self, odds_key):
-        """Get mapping data for odds key from MongoDB"""
-        odds_value_mappings = None
-        standardized_key = odds_key
-
-        for mapping_entry in self.odds_type_mappings:
-            try:
-                if odds_key.lower() == mapping_entry['id']:
-                    standardized_key = mapping_entry['id']
-                    odds_value_mappings = mapping_entry.get('ovs')
-                    break
-                elif 'maps' in mapping_entry and odds_key.lower() in mapping_entry['maps']:
-                    standardized_key = mapping_entry['id']
-                    odds_value_mappings = mapping_entry.get('ovs')
-                    break
-            except Exception as mapping_error:
-                log_scraper_progress(
-                    self.custom_logger, 'MAPPING_ERROR',
-                    f'Error in odds mapping: {mapping_error}',
-                    error=mapping_error
-                )
-
-        return [odds_value_mappings, standardized_key]
-
     def _process_bulk_updates_if_needed(self):
         """Process bulk updates if batch size is reached"""
         if len(self.bulk_update_operations) >= self.BULK_UPDATE_BATCH_SIZE:
@@ -781,12 +722,8 @@ class BovadaLiveOddsSpider(scrapy.Spider):
             return
 
         try:
-            bulk_result = execute_bulk_write_operations(
-                self.matches_collection,
-                self.bulk_update_operations,
-                "bovada_live_updates",
-                self.custom_logger
-            )
+            # Written by the background writer thread, the callback doesn't wait for Mongo
+            self.bulk_writer.submit(self.bulk_update_operations)
 
             self.bulk_update_operations = []  # Clear operations list
 
@@ -821,6 +758,7 @@ class BovadaLiveOddsSpider(scrapy.Spider):
                     f'Executing final {len(self.bulk_update_operations)} live bulk operations'
                 )
                 self._execute_bulk_updates()
+            self.bulk_writer.close()
 
             log_scraper_progress(
                 self.custom_logger, 'LIVE_SCRAPER_COMPLETED',
@@ -834,6 +772,13 @@ class BovadaLiveOddsSpider(scrapy.Spider):
                 f'Failed: {self.failed_live_matches}, Unique odds: {len(self.unique_odds_keys)}'
             )
 
+            self.market_classifications.flush()
+            log_scraper_progress(
+                self.custom_logger, 'MARKET_CACHE_STATS',
+                f'Market classifications - Hits: {self.market_classifications.hits}, '
+                f'Misses: {self.market_classifications.misses}'
+            )
+
         except Exception as cleanup_error:
             log_scraper_progress(
                 self.custom_logger, 'LIVE_CLEANUP_ERROR',
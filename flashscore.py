@@ -1,12 +1,11 @@
 import scrapy
 from scrapy.crawler import CrawlerProcess
 import json
-from pymongo import MongoClient
 from datetime import datetime
 import pytz
 from helper import (
     setup_scraper_logger, log_scraper_progress,
-    execute_bulk_write_operations, store_data_into_mongodb
+    execute_bulk_write_operations, store_data_into_mongodb, get_mapping_snapshot_service, get_database
 )
 
 
@@ -42,23 +41,10 @@ class FlashscoreFixturesSpider(scrapy.Spider):
         log_scraper_progress(self.custom_logger, 'INIT', 'Initializing Flashscore fixtures scraper')
 
         # Database connection
-        mongodb_client = MongoClient(
-            'mongodb://localhost:27017/',
-            maxPoolSize=50,  # Increase pool size
-            minPoolSize=10,  # Keep minimum connections
-            maxIdleTimeMS=30000,  # Keep connections alive longer
-            serverSelectionTimeoutMS=10000,  # 10 second timeout
-            connectTimeoutMS=10000,
-            socketTimeoutMS=0,  # No socket timeout (important!)
-            waitQueueTimeoutMS=10000,
-            retryWrites=True,
-            heartbeatFrequencyMS=10000  # Check connection every 10s
-        )
-        betting_database = mongodb_client['betting']
+        betting_database = get_database()
 
-        # Load country data
-        country_collection = betting_database['cos']
-        self.country_data = list(country_collection.find())
+        # Country data is shared by every spider in the process and refreshed in the background
+        self.mapping_snapshots = get_mapping_snapshot_service(betting_database, self.custom_logger)
 
         # Collections for storing processed data
         self.all_sports_mapping = {}
@@ -75,7 +61,7 @@ class FlashscoreFixturesSpider(scrapy.Spider):
 
         log_scraper_progress(
             self.custom_logger, 'INIT_COMPLETE',
-            f'Loaded {len(self.country_data)} countries data'
+            f'Loaded {len(self.mapping_snapshots.snapshot.country_data)} countries data'
         )
 
     def start_requests(self):
@@ -233,18 +219,22 @@ class FlashscoreFixturesSpider(scrapy.Spider):
             competitor1_name = match_segment.split('¬AE÷')[-1].split('¬')[0]
             competitor2_name = match_segment.split('AF÷')[-1].split('¬')[0]
 
+            country_id = self.mapping_snapshots.snapshot.country_index.resolve(country_name)
+
             # Build match information dictionary
             match_information = {
                 "match_id": match_id,
                 "sport": sport_name,
                 "country": country_name,
+                "country_id": country_id,
                 "group": league_name,
                 "timestamp": standardized_match_datetime,
                 "competitor1": competitor1_name,
                 "competitor2": competitor2_name,
                 "status": "sched",
-                "is_country": self._check_if_valid_country(country_name),
+                "is_country": country_id is not None,
                 "prices": {},
+                "price_hashes": {},
             }
 
             # Generate match link
@@ -277,18 +267,6 @@ class FlashscoreFixturesSpider(scrapy.Spider):
             )
             return False
 
-    def _check_if_valid_country(self, country_name):
-        """
-        Check if the country exists in our country data
-
-        :param country_name: Name of the country to check
-        :return: True if country is valid, False otherwise
-        """
-        for country_info in self.country_data:
-            if country_info['id'] == country_name.lower():
-                return True
-        return False
-
     def close(self, reason):
         """Final cleanup and data storage"""
         try:
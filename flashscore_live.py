@@ -1,10 +1,10 @@
 import scrapy
 import json
-from pymongo import MongoClient, UpdateOne
+from pymongo import UpdateOne
 from scrapy.crawler import CrawlerProcess
 from helper import (
     setup_scraper_logger, log_scraper_progress,
-    execute_bulk_write_operations
+    get_database, BackgroundBulkWriter
 )
 
 
@@ -67,24 +67,13 @@ class FlashscoreLiveResultsSpider(scrapy.Spider):
         log_scraper_progress(self.custom_logger, 'INIT', 'Initializing Flashscore Live Results scraper')
 
         # Database connection
-        mongodb_client = MongoClient(
-            'mongodb://localhost:27017/',
-            maxPoolSize=50,  # Increase pool size
-            minPoolSize=10,  # Keep minimum connections
-            maxIdleTimeMS=30000,  # Keep connections alive longer
-            serverSelectionTimeoutMS=10000,  # 10 second timeout
-            connectTimeoutMS=10000,
-            socketTimeoutMS=0,  # No socket timeout (important!)
-            waitQueueTimeoutMS=10000,
-            retryWrites=True,
-            heartbeatFrequencyMS=10000  # Check connection every 10s
-        )
-        betting_database = mongodb_client['betting']
+        betting_database = get_database()
         self.matches_collection = betting_database['matches_data']
 
         # Collections for bulk operations
         self.all_sports_mapping = {}
         self.bulk_update_operations = []
+        self.bulk_writer = BackgroundBulkWriter(self.matches_collection, "flashscore_live_updates", self.custom_logger)
 
         # Counters
         self.total_matches_updated = 0
@@ -253,12 +242,8 @@ class FlashscoreLiveResultsSpider(scrapy.Spider):
             return
 
         try:
-            bulk_result = execute_bulk_write_operations(
-                self.matches_collection,
-                self.bulk_update_operations,
-                "flashscore_live_updates",
-                self.custom_logger
-            )
+            # Written by the background writer thread, the callback doesn't wait for Mongo
+            self.bulk_writer.submit(self.bulk_update_operations)
 
             self.bulk_update_operations = []  # Clear operations list
 
@@ -280,6 +265,7 @@ class FlashscoreLiveResultsSpider(scrapy.Spider):
                     f'Executing final {len(self.bulk_update_operations)} live bulk operations'
                 )
                 self._execute_bulk_updates()
+            self.bulk_writer.close()
 
             log_scraper_progress(
                 self.custom_logger, 'LIVE_RESULTS_SCRAPER_COMPLETED',
@@ -1,12 +1,127 @@
+import atexit
+import bisect
+import hashlib
+import heapq
 import logging
 import os
+import pickle
+import queue
 from datetime import datetime, timedelta
 import secrets
 import string
 import pytz
-from pymongo import MongoClient, UpdateOne
-from rapidfuzz import fuzz
+from pymongo import MongoClient, UpdateOne, DeleteOne, InsertOne, ReplaceOne
+from pymongo.errors import AutoReconnect, BulkWriteError
+import bson
+from bson import json_util
+from rapidfuzz import fuzz, process
 import re
+import sys
+import unicodedata
+import threading
+import time
+from collections import Counter, namedtuple
+from functools import lru_cache
+
+
+MONGODB_URI = os.environ.get('MONGODB_URI', 'mongodb://localhost:27017/')
+MONGODB_DATABASE = 'betting'
+MONGODB_CLIENT_SETTINGS = {
+    'maxPoolSize': 50,  # Increase pool size
+    'minPoolSize': 10,  # Keep minimum connections
+    'maxIdleTimeMS': 30000,  # Keep connections alive longer
+    'serverSelectionTimeoutMS': 10000,  # 10 second timeout
+    'connectTimeoutMS': 10000,
+    'socketTimeoutMS': 0,  # No socket timeout (important!)
+    'waitQueueTimeoutMS': 10000,
+    'retryWrites': True,
+    'heartbeatFrequencyMS': 10000,  # Check connection every 10s
+}
+
+
+class MongoConnectionManager:
+    """
+    One pooled MongoClient per process
+    Spiders, helpers and scripts running in the same process share the client,
+    so server selection and handshakes happen once and the pool is reused. The
+    client is created on first use, recreated in a forked child (MongoClient
+    isn't fork-safe) and closed at interpreter exit.
+    """
+
+    def __init__(self, uri=None, **client_settings):
+        """
+        :param uri: str - MongoDB connection string, MONGODB_URI if None
+        :param client_settings: MongoClient options overriding MONGODB_CLIENT_SETTINGS
+        """
+        self.uri = uri or MONGODB_URI
+        self.client_settings = {**MONGODB_CLIENT_SETTINGS, **client_settings}
+        self._client = None
+        self._client_pid = None
+        self._lock = threading.Lock()
+
+    def configure(self, uri=None, **client_settings):
+        """
+        Change the URI or pool settings, takes effect with the next client
+
+        :param uri: str - MongoDB connection string, unchanged if None
+        :param client_settings: MongoClient options to override
+        """
+        with self._lock:
+            self.uri = uri or self.uri
+            self.client_settings.update(client_settings)
+
+    @property
+    def client(self):
+        if self._client is not None and self._client_pid == os.getpid():
+            return self._client
+
+        with self._lock:
+            if self._client is None or self._client_pid != os.getpid():
+                self._client = MongoClient(self.uri, **self.client_settings)
+                self._client_pid = os.getpid()
+            return self._client
+
+    def get_database(self, database_name=MONGODB_DATABASE):
+        return self.client[database_name]
+
+    def get_collection(self, collection_name, database_name=MONGODB_DATABASE):
+        return self.client[database_name][collection_name]
+
+    def close(self):
+        """Close the client of this process, a later call opens a new one"""
+        with self._lock:
+            if self._client is not None and self._client_pid == os.getpid():
+                self._client.close()
+            self._client = None
+            self._client_pid = None
+
+
+mongo_connections = MongoConnectionManager()
+atexit.register(mongo_connections.close)
+
+
+def get_mongo_client():
+    """
+    :return: MongoClient - the process-wide pooled client
+    """
+    return mongo_connections.client
+
+
+def get_database(database_name=MONGODB_DATABASE):
+    """
+    :param database_name: str - database name
+    :return: Database handle on the process-wide pooled client
+    """
+    return mongo_connections.get_database(database_name)
+
+
+def get_collection(collection_name, database_name=MONGODB_DATABASE):
+    """
+    :param collection_name: str - collection name
+    :param database_name: str - database name
+    :return: Collection handle on the process-wide pooled client
+    """
+    return mongo_connections.get_collection(collection_name, database_name)
 
 
 def setup_scraper_logger(scraper_name):
@@ -237,7 +352,7 @@ def is_next_8_day_match(match_date, date_format=None):
     return time_difference <= timedelta(days=8) and time_difference >= timedelta(0)
 
 
-def execute_bulk_write_operations(collection, bulk_operations, operation_type="update", logger=None):
+def execute_bulk_write_operations(collection, bulk_operations, operation_type="update", logger=None, ordered=True):
     """
     Execute bulk write operations with logging
 
@@ -245,6 +360,7 @@ def execute_bulk_write_operations(collection, bulk_operations, operation_type="u
     :param bulk_operations: list of bulk operations
     :param operation_type: str - type of operation (update, insert, etc.)
     :param logger: logger object
+    :param ordered: bool - stop at the first error and apply in order, False lets the server apply them in parallel
     :return: bulk write result
     """
     if not bulk_operations:
@@ -256,7 +372,7 @@ def execute_bulk_write_operations(collection, bulk_operations, operation_type="u
         if logger:
             logger.info(f"Executing {len(bulk_operations)} bulk {operation_type} operations")
 
-        bulk_result = collection.bulk_write(bulk_operations)
+        bulk_result = collection.bulk_write(bulk_operations, ordered=ordered)
 
         if logger:
             logger.info(f"Bulk {operation_type} completed successfully:")
@@ -272,13 +388,474 @@ def execute_bulk_write_operations(collection, bulk_operations, operation_type="u
         raise bulk_error
 
 
+def _bulk_operation_key(operation):
+    """Operations with the same key target the same document, None if never coalesced (inserts)"""
+    operation_filter = getattr(operation, '_filter', None)
+    if operation_filter is None:
+        return None
+    return type(operation).__name__, json_util.dumps(operation_filter, sort_keys=True)
+
+
+def _set_paths_conflict(first_set, second_set):
+    """True if a field path of one $set is a parent of a different field path of the other"""
+    for first_path in first_set:
+        for second_path in second_set:
+            if first_path != second_path and (
+                    second_path.startswith(first_path + '.') or first_path.startswith(second_path + '.')):
+                return True
+    return False
+
+
+def coalesce_bulk_operations(earlier_operation, later_operation):
+    """
+    Merge two updates of the same document into one, the later $set values win
+
+    :param earlier_operation: UpdateOne
+    :param later_operation: UpdateOne with the same filter
+    :return: UpdateOne or None if the two can't be merged ($set only, same upsert and options)
+    """
+    if not isinstance(earlier_operation, UpdateOne) or not isinstance(later_operation, UpdateOne):
+        return None
+    earlier_update, later_update = earlier_operation._doc, later_operation._doc
+    if not isinstance(earlier_update, dict) or not isinstance(later_update, dict):
+        return None
+    if set(earlier_update) != {'$set'} or set(later_update) != {'$set'}:
+        return None
+    if earlier_operation._upsert != later_operation._upsert:
+        return None
+    for option in ('_collation', '_array_filters', '_hint', '_sort'):
+        if getattr(earlier_operation, option, None) is not None or getattr(later_operation, option, None) is not None:
+            return None
+    if _set_paths_conflict(earlier_update['$set'], later_update['$set']):
+        return None
+
+    return UpdateOne(
+        earlier_operation._filter,
+        {'$set': {**earlier_update['$set'], **later_update['$set']}},
+        upsert=earlier_operation._upsert
+    )
+
+
+def _bulk_operation_size(operation):
+    """Approximate BSON size in bytes of a bulk operation's filter and document"""
+    operation_size = 0
+    for part in (getattr(operation, '_filter', None), getattr(operation, '_doc', None)):
+        if part is None:
+            continue
+        try:
+            operation_size += len(bson.encode(part))
+        except Exception:
+            # Update pipelines (lists) and other non-document parts
+            operation_size += len(json_util.dumps(part))
+    return operation_size
+
+
+class AdaptiveBatchSizer:
+    """
+    Bulk write batch size driven by observed write latency
+    A batch is full at `operations` operations or MAX_BYTES of payload. Full
+    batches acknowledged within TARGET_LATENCY_SECONDS grow the size by a
+    quarter; slower acknowledgements halve it (within MIN/MAX_OPERATIONS).
+    """
+
+    TARGET_LATENCY_SECONDS = 0.5
+    MIN_OPERATIONS = 10
+    MAX_OPERATIONS = 2000
+    # Well under the 48MB a single bulk_write message may carry
+    MAX_BYTES = 8 * 1024 * 1024
+
+    def __init__(self, initial_operations=100, target_latency_seconds=None):
+        """
+        :param initial_operations: int - batch size before any write was measured
+        :param target_latency_seconds: float - acknowledgement time to stay under, TARGET_LATENCY_SECONDS if None
+        """
+        self.operations = min(max(initial_operations, self.MIN_OPERATIONS), self.MAX_OPERATIONS)
+        self.target_latency_seconds = target_latency_seconds or self.TARGET_LATENCY_SECONDS
+        self.batch_count = 0
+        self.operation_total = 0
+        self.latency_total = 0.0
+
+    def is_full(self, operation_count, payload_bytes):
+        return operation_count >= self.operations or payload_bytes >= self.MAX_BYTES
+
+    def record(self, operation_count, latency_seconds):
+        """
+        :param operation_count: int - operations in the acknowledged batch
+        :param latency_seconds: float - bulk_write round trip
+        """
+        self.batch_count += 1
+        self.operation_total += operation_count
+        self.latency_total += latency_seconds
+
+        if latency_seconds > self.target_latency_seconds:
+            self.operations = max(self.MIN_OPERATIONS, self.operations // 2)
+        elif operation_count >= self.operations:
+            # Only batches cut by the size limit say anything about a larger size
+            self.operations = min(self.MAX_OPERATIONS, self.operations + max(1, self.operations // 4))
+
+    @property
+    def average_batch_size(self):
+        return self.operation_total / self.batch_count if self.batch_count else 0.0
+
+    @property
+    def average_latency_seconds(self):
+        return self.latency_total / self.batch_count if self.batch_count else 0.0
+
+
+_SPILLABLE_OPERATIONS = {operation_class.__name__: operation_class
+                         for operation_class in (UpdateOne, InsertOne, ReplaceOne, DeleteOne)}
+
+
+def spill_bulk_operations(spill_file, operations, attempts=None):
+    """
+    Append bulk operations that couldn't be written to a JSON lines file (MongoDB extended JSON)
+
+    :param spill_file: str - path of the spill file
+    :param operations: list of UpdateOne / InsertOne / ReplaceOne / DeleteOne
+    :param attempts: list - number of failed writes of each operation, 1 each if None
+    """
+    with open(spill_file, 'a', encoding='utf-8') as spill:
+        for position, operation in enumerate(operations):
+            spill.write(json_util.dumps({
+                'operation': type(operation).__name__,
+                'filter': getattr(operation, '_filter', None),
+                'document': getattr(operation, '_doc', None),
+                'upsert': getattr(operation, '_upsert', None),
+                'attempts': attempts[position] if attempts is not None else 1,
+            }) + '\n')
+
+
+def load_spilled_operations(spill_file):
+    """
+    Read back the operations of a spill file
+
+    :param spill_file: str - path of the spill file
+    :return: list - (bulk operation, number of failed writes) pairs
+    """
+    operations = []
+    with open(spill_file, encoding='utf-8') as spill:
+        for line in spill:
+            if not line.strip():
+                continue
+            spilled = json_util.loads(line)
+            operation_class = _SPILLABLE_OPERATIONS[spilled['operation']]
+            if operation_class is InsertOne:
+                operation = InsertOne(spilled['document'])
+            elif operation_class is DeleteOne:
+                operation = DeleteOne(spilled['filter'])
+            else:
+                operation = operation_class(spilled['filter'], spilled['document'], upsert=bool(spilled['upsert']))
+            operations.append((operation, spilled.get('attempts', 1)))
+    return operations
+
+
+class BackgroundBulkWriter:
+    """
+    Bulk writes off the Scrapy reactor
+    Spider callbacks submit operations to a bounded queue and return at once; a
+    writer thread collects them into unordered bulk writes of up to
+    WRITE_BATCH_SIZE operations, or whatever arrived within
+    FLUSH_INTERVAL_SECONDS. Updates of the same document within a batch are
+    coalesced into one; when two can't be merged the batch is written first, so
+    unordered writes never reorder updates of one document. A full queue blocks
+    submit() until the writer catches up. close() drains the queue.
+    Batch sizes adapt to the write latency (see AdaptiveBatchSizer). A write
+    failing on the connection (AutoReconnect, NetworkTimeout) is retried
+    MAX_RETRIES times; operations that still fail are spilled to
+    `scraper_logs/<collection>_<operation type>_failed_writes.jsonl` and replayed
+    by the next writer of the same collection and operation type, until they
+    failed in MAX_REPLAY_ATTEMPTS runs. The collection is part of the name as one
+    operation type can write to different collections (a spider's staged and
+    inline modes). Operations the server rejects (write errors, invalid
+    documents) would fail the same way again: they are quarantined to
+    `scraper_logs/<collection>_<operation type>_rejected_writes.jsonl` and never
+    replayed.
+    """
+
+    WRITE_BATCH_SIZE = 500
+    FLUSH_INTERVAL_SECONDS = 2.0
+    MAX_QUEUED_OPERATIONS = 5000
+    MAX_RETRIES = 3
+    RETRY_BACKOFF_SECONDS = 1.0
+    # Runs that may replay a spilled operation before it is quarantined
+    MAX_REPLAY_ATTEMPTS = 3
+    SPILL_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scraper_logs')
+
+    _FLUSH = object()
+    _STOP = object()
+
+    def __init__(self, collection, operation_type, logger=None, write_batch_size=None, flush_interval_seconds=None,
+                 max_queued_operations=None):
+        """
+        :param collection: MongoDB collection written to
+        :param operation_type: str - label of the writes in the logs (e.g., 'tipico_updates')
+        :param logger: logger object
+        :param write_batch_size: int - operations per bulk write until latency is measured, WRITE_BATCH_SIZE if None
+        :param flush_interval_seconds: float - max time an operation waits for its batch, FLUSH_INTERVAL_SECONDS if None
+        :param max_queued_operations: int - queue bound before submit() blocks, MAX_QUEUED_OPERATIONS if None
+        """
+        self.collection = collection
+        self.operation_type = operation_type
+        self.logger = logger
+        self.batch_sizer = AdaptiveBatchSizer(write_batch_size or self.WRITE_BATCH_SIZE)
+        self.flush_interval_seconds = flush_interval_seconds or self.FLUSH_INTERVAL_SECONDS
+
+        self._queue = queue.Queue(max_queued_operations or self.MAX_QUEUED_OPERATIONS)
+        self._closed = False
+
+        self.submitted_count = 0
+        self.written_count = 0
+        self.coalesced_count = 0
+        self.failed_count = 0
+        self.batch_count = 0
+        self.blocked_count = 0
+        self.retried_count = 0
+        self.spilled_count = 0
+        self.replayed_count = 0
+        self.quarantined_count = 0
+        # id() of the replayed operations -> their failed writes so far
+        self._failed_attempts = {}
+
+        os.makedirs(self.SPILL_DIRECTORY, exist_ok=True)
+        file_prefix = f'{collection.name}_{operation_type}'
+        self.spill_file = os.path.join(self.SPILL_DIRECTORY, f'{file_prefix}_failed_writes.jsonl')
+        self.quarantine_file = os.path.join(self.SPILL_DIRECTORY, f'{file_prefix}_rejected_writes.jsonl')
+
+        self._writer_thread = threading.Thread(
+            target=self._write_loop, name=f'bulk-writer-{operation_type}', daemon=True
+        )
+        self._writer_thread.start()
+        self._replay_spilled_operations()
+
+    def _replay_spilled_operations(self):
+        """Queue the operations a previous run spilled, ahead of this run's"""
+        if not os.path.exists(self.spill_file):
+            return
+
+        replay_file = self.spill_file + '.replay'
+        try:
+            os.replace(self.spill_file, replay_file)
+            replayed_operations = []
+            exhausted_operations = []
+            exhausted_attempts = []
+            for operation, attempts in load_spilled_operations(replay_file):
+                if attempts >= self.MAX_REPLAY_ATTEMPTS:
+                    exhausted_operations.append(operation)
+                    exhausted_attempts.append(attempts)
+                    continue
+                self._failed_attempts[id(operation)] = attempts
+                replayed_operations.append(operation)
+            self._quarantine(exhausted_operations, exhausted_attempts, f'failed in {self.MAX_REPLAY_ATTEMPTS} runs')
+            self.submit(replayed_operations)
+            os.remove(replay_file)
+            self.replayed_count = len(replayed_operations)
+        except Exception as replay_error:
+            if self.logger:
+                log_scraper_progress(
+                    self.logger, 'BULK_WRITER_REPLAY_ERROR', f'Failed to replay {self.spill_file}', error=replay_error
+                )
+            return
+
+        if self.logger and self.replayed_count:
+            log_scraper_progress(
+                self.logger, 'BULK_WRITER_REPLAY', f'Replaying {self.replayed_count} spilled {self.operation_type}'
+            )
+
+    def submit(self, operations):
+        """
+        Queue operations for the writer thread, blocking while the queue is full
+
+        :param operations: list of bulk operations
+        """
+        if self._closed:
+            raise RuntimeError(f'Bulk writer {self.operation_type} is closed')
+
+        for operation in operations:
+            try:
+                self._queue.put_nowait(operation)
+            except queue.Full:
+                # Backpressure: the reactor waits for the writer instead of buffering without bound
+                self.blocked_count += 1
+                self._queue.put(operation)
+            self.submitted_count += 1
+
+    def flush(self):
+        """Write everything submitted so far and wait for it"""
+        if self._closed:
+            return
+        self._queue.put(self._FLUSH)
+        self._queue.join()
+
+    def close(self):
+        """Drain the queue, write the last batch and stop the writer thread"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(self._STOP)
+        self._writer_thread.join()
+
+        if self.logger:
+            log_scraper_progress(
+                self.logger, 'BULK_WRITER_STATS',
+                f'{self.operation_type} - Submitted: {self.submitted_count}, Written: {self.written_count}, '
+                f'Coalesced: {self.coalesced_count}, Failed: {self.failed_count}, Batches: {self.batch_count}, '
+                f'Backpressure waits: {self.blocked_count}, Retried: {self.retried_count}, '
+                f'Spilled: {self.spilled_count}, Replayed: {self.replayed_count}, '
+                f'Quarantined: {self.quarantined_count}'
+            )
+            log_scraper_progress(
+                self.logger, 'BULK_BATCH_SIZE_STATS',
+                f'{self.operation_type} - Current batch size: {self.batch_sizer.operations}, '
+                f'Average batch size: {self.batch_sizer.average_batch_size:.1f}, '
+                f'Average write latency: {self.batch_sizer.average_latency_seconds * 1000:.0f}ms'
+            )
+
+    def _write_loop(self):
+        batch_operations = []
+        batch_positions = {}
+        batch_sizes = []
+        taken_items = 0
+        flush_deadline = None
+
+        while True:
+            timeout = None if flush_deadline is None else max(0.0, flush_deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+                taken_items += 1
+            except queue.Empty:
+                # The oldest operation of the batch waited FLUSH_INTERVAL_SECONDS
+                item = self._FLUSH
+
+            if item is self._FLUSH or item is self._STOP:
+                self._write(batch_operations)
+                batch_operations, batch_positions, batch_sizes, flush_deadline = [], {}, [], None
+                taken_items = self._mark_done(taken_items)
+                if item is self._STOP:
+                    return
+                continue
+
+            operation_key = _bulk_operation_key(item)
+            position = batch_positions.get(operation_key) if operation_key is not None else None
+            if position is not None:
+                merged_operation = coalesce_bulk_operations(batch_operations[position], item)
+                if merged_operation is not None:
+                    # A merged replayed operation keeps its failed writes
+                    merged_attempts = max(
+                        self._failed_attempts.pop(id(batch_operations[position]), 0),
+                        self._failed_attempts.pop(id(item), 0)
+                    )
+                    if merged_attempts:
+                        self._failed_attempts[id(merged_operation)] = merged_attempts
+                    batch_operations[position] = merged_operation
+                    batch_sizes[position] = _bulk_operation_size(merged_operation)
+                    self.coalesced_count += 1
+                    continue
+
+                # Updates of one document that can't be merged go to separate writes, in order
+                self._write(batch_operations)
+                batch_operations, batch_positions, batch_sizes, flush_deadline = [], {}, [], None
+                taken_items = self._mark_done(taken_items - 1) + 1
+
+            if operation_key is not None:
+                batch_positions[operation_key] = len(batch_operations)
+            batch_operations.append(item)
+            batch_sizes.append(_bulk_operation_size(item))
+            if flush_deadline is None:
+                flush_deadline = time.monotonic() + self.flush_interval_seconds
+
+            if self.batch_sizer.is_full(len(batch_operations), sum(batch_sizes)):
+                self._write(batch_operations)
+                batch_operations, batch_positions, batch_sizes, flush_deadline = [], {}, [], None
+                taken_items = self._mark_done(taken_items)
+
+    def _mark_done(self, taken_items):
+        for _ in range(taken_items):
+            self._queue.task_done()
+        return 0
+
+    def _write(self, operations):
+        if not operations:
+            return
+
+        retries = 0
+        while True:
+            write_started = time.monotonic()
+            try:
+                execute_bulk_write_operations(
+                    self.collection, operations, self.operation_type, self.logger, ordered=False
+                )
+                self.batch_sizer.record(len(operations), time.monotonic() - write_started)
+                self.written_count += len(operations)
+                break
+            except BulkWriteError as bulk_write_error:
+                # Unordered: every operation without a write error was applied, and the
+                # ones with one (duplicate key, invalid document) would fail the same way again
+                failed_indexes = sorted({
+                    write_error['index'] for write_error in bulk_write_error.details.get('writeErrors', [])
+                })
+                self.written_count += len(operations) - len(failed_indexes)
+                self._quarantine([operations[index] for index in failed_indexes], error=bulk_write_error)
+                break
+            except AutoReconnect as write_error:
+                # Lost connections and network timeouts (NetworkTimeout) are slow acks too
+                self.batch_sizer.record(len(operations), time.monotonic() - write_started)
+                if retries >= self.MAX_RETRIES:
+                    self._spill(operations, write_error)
+                    break
+                retries += 1
+                self.retried_count += 1
+                time.sleep(self.RETRY_BACKOFF_SECONDS * 2 ** (retries - 1))
+            except Exception as write_error:
+                # Rejected by the server or the driver (invalid document, operation failure)
+                self._quarantine(operations, error=write_error)
+                break
+        for operation in operations:
+            self._failed_attempts.pop(id(operation), None)
+        self.batch_count += 1
+
+    def _spill(self, operations, write_error):
+        if not operations:
+            return
+
+        self.failed_count += len(operations)
+        attempts = [self._failed_attempts.get(id(operation), 0) + 1 for operation in operations]
+        try:
+            spill_bulk_operations(self.spill_file, operations, attempts)
+            self.spilled_count += len(operations)
+            spill_details = f'Spilled {len(operations)} {self.operation_type} to {self.spill_file}'
+        except Exception as spill_error:
+            write_error = spill_error
+            spill_details = f'Lost {len(operations)} {self.operation_type}, spill file not writable'
+
+        if self.logger:
+            log_scraper_progress(self.logger, 'BULK_WRITER_ERROR', spill_details, error=write_error)
+
+    def _quarantine(self, operations, attempts=None, reason='rejected', error=None):
+        if not operations:
+            return
+
+        self.failed_count += len(operations)
+        try:
+            spill_bulk_operations(self.quarantine_file, operations, attempts)
+            self.quarantined_count += len(operations)
+            quarantine_details = (
+                f'Quarantined {len(operations)} {self.operation_type} ({reason}) to {self.quarantine_file}'
+            )
+        except Exception as quarantine_error:
+            error = quarantine_error
+            quarantine_details = (
+                f'Lost {len(operations)} {self.operation_type} ({reason}), quarantine file not writable'
+            )
+
+        if self.logger:
+            log_scraper_progress(self.logger, 'BULK_WRITER_REJECTED', quarantine_details, error=error)
+
+
 def store_data_into_mongodb(matches_data, database_name, logger=None):
     """
     Store match data into MongoDB with consistent timestamp handling and bulk operations
     """
-    client = MongoClient('mongodb://localhost:27017')
-    db = client['betting']
-    collection = db[database_name]
+    collection = get_collection(database_name)
 
     operations = []
     for match in matches_data:
@@ -308,9 +885,7 @@ def store_data_into_mongodb(matches_data, database_name, logger=None):
 
 
 def store_competitor_mapping_data(docs, logger=None):
-    client = MongoClient('mongodb://localhost:27017')
-    db = client['betting']
-    collection = db['competitor_mapping']
+    collection = get_collection('competitor_mapping')
     operations = []
 
     for doc in docs:
@@ -361,305 +936,1330 @@ def normalize_timestamp_for_comparison(timestamp):
 
 
 def update_data():
-    client = MongoClient('mongodb://localhost:27017')
-    db = client['betting']
-    collection = db['matches_data']
+    collection = get_collection('matches_data')
 
 
-def check_key(name):
-    not_used_key = ['scoreless','end','go', 'never', 'niether', 'total runs', 'to score', 'get', 'including overtime', 'own', 'retain',
-                    ':', '0:', 'award', 'kick',
-                    'penalty', 'target', 'shots', 'series', 'yellow', 'super over',
-                    'header', '4s', 'touchdown', 'of the match', 'hero', 'tries', 'more', '6s', 'fifty', 'scored',
-                    'century', 'last', "player's total runs", 'given', 'red', 'retain', 'most', 'odd/even',
-                    'performance', 'converted', 'listed', 'center', 'margin', 'try', 'either', 'hc ', 'runs ',
-                    'rushing', 'out', 'yards', 'receving', 'both', 'and', 'remaining', '(', ')', 'tie', 'break',
-                    'deuce', 'next', 'touchdowns', 'range', 'will', '?', 'did', 'does', 'hour', 'minute', 'halves',
-                    'scorer',
-                    'betting', '&', '1 .ht', '1. ht', '1.ht', 'number of runs in match', 'how', 'which', 'who',
-                    'result', 'win', 'halftime', 'legs', 'half time', 'full time',
-                    'tackles', 'attempts', 'final', 'frame', 'side', 'wides', 'highest', 'four',
-                    'sixes', 'assists', 'made', 'home', 'away', 'rebounds', 'milestones', 'qualify', 'exact',
-                    'bottom', 'top', 'wicket', 'at least', 'at end', 'at the end', 'before', 'after', 'fulltime',
-                    'lead', 'race', 'stats', 'specials', 'squares', 'puck', 'record']
-
-    if not any(word in name.lower() for word in not_used_key):
-        if '2-way & over/under' in name.lower():
-            return False
-        if 'half' in name.lower():
-            if 'point spread' in name.lower() and 'o/u' in name.lower():
-                return False
-            if 'winner' in name.lower():
-                return False
-            return True
-        elif 'first' not in name.lower():
-            if 'point spread' in name.lower() and 'o/u' in name.lower():
-                return False
-            if 'winner' in name.lower():
-                return False
-            return True
-    return False
+def compute_mapping_version(documents):
+    """
+    Build a version stamp for a mapping collection (`ots`, `cos`)
+    Combines the document count with the latest `updatedAt`, so adding, removing
+    or editing a mapping document produces a new stamp
 
+    :param documents: list of mapping documents
+    :return: str - version stamp
+    """
+    latest_update = None
+    for document in documents:
+        updated_at = document.get('updatedAt')
+        if isinstance(updated_at, dict):
+            # Mongo export format: {"$date": "2024-09-09T13:23:16.206Z"}
+            updated_at = datetime.fromisoformat(str(updated_at.get('$date')).replace('Z', '+00:00'))
+        if not isinstance(updated_at, datetime):
+            continue
 
-def check_sport_name(sport_name):
-    sport_name = sport_name.replace('-', '').replace(' ', '').lower()
-    all_sport_name = ['rugby', 'football', 'soccer', 'tennis', 'basketball', 'hockey', 'americanfootball', 'baseball',
-                      'handball', 'rugbyunion',
-                      'floorball', 'bandy', 'futsal', 'volleyball', 'cricket', 'snooker', 'beachvolleyball',
-                      'aussierules',
-                      'rugbyleague', 'badminton', 'waterpolo', 'fieldhockey', 'tabletennis', 'beachsoccer', 'netball',
-                      'pesapallo',
-                      'kabaddi']
-    # all_sport_name = ['soccer']
-    if sport_name in all_sport_name:
-        return True
-    return False
+        updated_at = normalize_timestamp_for_comparison(updated_at)
+        if latest_update is None or updated_at > latest_update:
+            latest_update = updated_at
 
+    return _format_mapping_version(len(documents), latest_update)
 
-def check_header_name(key):
-    original_key = key
-    conversion_list = ['-half-1', '-half-2', '-one-half', '-period-1', '-period-2', '-period-3', '-set-1', '-set-2',
-                       '-set-3', '-set-4', '-set-5', '-quarter-1', '-quarter-2', '-quarter-3', '-quarter-4',
-                       '-inning-1',
-                       '-inning-2', '-inning-3', '-inning-4', '-inning-5', '-inning-6', '-inning-7', '-inning-8',
-                       '-inning-9']
-    for repl in conversion_list:
-        original_key = original_key.replace(repl, '')
-
-    checked = ['top', 'wicket', 'halftime', 'at least', 'at end', 'at the end',
-               'before', 'after', 'fulltime', 'lead']
-    if not any(word in key.lower() for word in checked):
-        half_data = ['half', '. h', ' .h']
-        key = key.replace(' ', '').replace('-', '')
-        if any(word.replace(' ', '').replace('-', '') in key.lower() for word in half_data):
-            h1 = ['1sthalf', 'firsthalf', '1h', '1h', '1h',
-                  'halfnumber1', 'halfno1', 'half1', '1half']
-            h2 = ['2ndhalf', 'secondhalf', '2h', '2h', '2h',
-                  'halfnumber2', 'halfno2', 'half2', '2half']
-            if any(word.replace("-", "").replace(" ", "") in key.lower() for word in h1):
-                if 'first half' in key.lower():
-                    if key.lower().count('first') == 1:
-                        key_name = '1st Half'
 
+def fetch_mapping_version(collection):
+    """
+    Version stamp of a mapping collection computed on the server
+    Gives the same stamp as compute_mapping_version() on the collection's
+    documents, without loading them
+
+    :param collection: MongoDB collection (`ots`, `cos`)
+    :return: str - version stamp
+    """
+    latest_document = collection.find_one(
+        {'updatedAt': {'$type': 'date'}}, {'_id': 0, 'updatedAt': 1}, sort=[('updatedAt', -1)]
+    )
+    latest_update = latest_document['updatedAt'] if latest_document else None
+    return _format_mapping_version(collection.count_documents({}), latest_update)
 
-                    else:
-                        key_name = 'Full Match'
-                elif 'first' in key.lower():
-                    key_name = 'Full Match'
-                else:
-                    key_name = '1st Half'
 
+def _format_mapping_version(document_count, latest_update):
+    latest_stamp = normalize_timestamp_for_comparison(latest_update).isoformat() if latest_update else ''
+    return f"{document_count}@{latest_stamp}"
 
 
-            elif any(word.replace("-", "").replace(" ", "") in key.lower() for word in
-                     h2) and 'first' not in key.lower():
-                key_name = '2nd Half'
+class OutcomeValueMatcher:
+    """
+    Precompiled matcher for one `ovs` list (outcome values of a canonical market)
+    An entry matches when its id equals the label, when one of its aliases contains
+    the lowercased label, or when the lowercased label contains one of its aliases.
+    Entries are tried in list order, so the first matching entry wins.
+    """
 
+    MAX_CACHED_LABELS = 10000
+
+    def __init__(self, value_mappings):
+        """
+        :param value_mappings: list - `ovs` entries of an odds type mapping
+        """
+        self._compiled_entries = []
+        for mapping_entry in value_mappings:
+            aliases = [alias.strip('[]') for alias in mapping_entry.get('maps') or [] if isinstance(alias, str)]
+            if aliases:
+                # Aliases joined with a separator that never occurs in labels: one `in` covers all of them
+                joined_aliases = '\x00'.join(aliases)
+                alias_pattern = re.compile('|'.join(re.escape(alias) for alias in aliases))
             else:
-                key_name = 'Full Match'
-
-        elif 'quarter' in key.lower():
-            q1 = ['1stquarter', 'quarter1', 'quarterone', 'firstquarter',
-                  '1quarter', 'quarterno1', 'quarternumber1',
-                  'quarter no.1']
-            q2 = ['2ndquarter', 'quarter2', 'quartertwo', 'secondquarter',
-                  '2quarter', 'quarterno2', 'quarternumber2',
-                  'quarter no.2']
-            q3 = ['3rdquarter', 'quarter3', 'quarterthree', 'thirdquarter',
-                  '3quarter', 'quarterno3', 'quarternumber3',
-                  'quarter no.3']
-            q4 = ['4thquarter', 'quarter4', 'quarterfour', 'fourthquarter',
-                  '4quarter', 'quarterno4', 'quarternumber4',
-                  'quarter no.4']
-            if any(word.replace("-", "").replace(" ", "") in key.lower() for word in q1):
-                if 'first quarter' in key.lower():
-                    if key.lower().count('first') == 1:
-                        key_name = '1st Quarter'
+                joined_aliases = None
+                alias_pattern = None
+            self._compiled_entries.append((mapping_entry['id'], joined_aliases, alias_pattern))
 
-                    else:
-                        key_name = 'Full Match'
-                elif 'first' in key.lower():
-                    key_name = 'Full Match'
+        self._matched_labels = {}
 
-                else:
-                    key_name = '1st Quarter'
+    def match(self, outcome_label):
+        """
+        Map an outcome label to its standard value id
 
+        :param outcome_label: str - outcome label (team names already replaced)
+        :return: str - value id, or the label unchanged when nothing matches
+        """
+        if outcome_label in self._matched_labels:
+            return self._matched_labels[outcome_label]
 
+        matched_value = self._match_uncached(outcome_label)
 
-            elif any(word.replace("-", "").replace(" ", "") in key.lower() for word in
-                     q2) and 'first' not in key.lower():
-                key_name = '2nd Quarter'
+        if len(self._matched_labels) >= self.MAX_CACHED_LABELS:
+            self._matched_labels.clear()
+        self._matched_labels[outcome_label] = matched_value
+        return matched_value
 
-            elif any(word.replace("-", "").replace(" ", "") in key.lower() for word in
-                     q3) and 'first' not in key.lower():
-                key_name = '3rd Quarter'
+    def _match_uncached(self, outcome_label):
+        lowered_label = outcome_label.lower()
 
-            elif any(word.replace("-", "").replace(" ", "") in key.lower() for word in
-                     q4) and 'first' not in key.lower():
-                key_name = '4th Quarter'
+        for entry_id, joined_aliases, alias_pattern in self._compiled_entries:
+            if entry_id == outcome_label:
+                return entry_id
+            if alias_pattern is None:
+                continue
+            if lowered_label in joined_aliases or alias_pattern.search(lowered_label):
+                return entry_id
 
-            else:
-                key_name = 'Full Match'
-        elif 'set' in key.lower():
-            s1 = ['1st set', 'set 1', 'set one', 'first set', 'set no. 1', 'set number 1',
-                  '1.set', '1 .set', '1. set', 'set no.1']
-            s2 = ['2nd set', 'set 2', 'set two', 'second set', 'set no. 2', 'set number 2',
-                  '2.set', '2 .set', '2. set', 'set no.2']
-            s3 = ['3rd set', 'set 3', 'set three', 'third set', 'set no. 3', 'set number 3',
-                  '3.set', '3 .set', '3. set', 'set no.3']
-            s4 = ['4th set', 'set 4', 'set four', 'fourth set', 'set no. 4', 'set number 4',
-                  '4.set', '4 .set', '4. set', 'set no.4']
-            s5 = ['5th set', 'set 5', 'set five', 'fifth set', 'set no. 5', 'set number 5',
-                  '5.set', '5 .set', '5. set', 'set no.5']
-            if any(word.replace("-", "").replace(" ", "") in key.lower() for word in s1):
-                if 'first set' in key.lower():
-                    if key.lower().count('first') == 1:
-                        key_name = '1st Set'
+        return outcome_label
 
-                    else:
-                        key_name = 'Full Match'
-                elif 'first' in key.lower():
-                    key_name = 'Full Match'
-                else:
-                    key_name = '1st Set'
 
+class OddsMappingResolver:
+    """
+    Hash index over the `ots` odds-type mapping documents
+    Every lowercased id and alias points at its mapping entry, so resolving a
+    market label is a single dict lookup instead of a scan over all entries.
+    When an alias appears in several entries the first entry wins, the same
+    as the original linear scan.
+    """
 
-            elif any(word.replace("-", "").replace(" ", "") in key.lower() for word in
-                     s2) and 'first' not in key.lower():
-                key_name = '2nd Set'
+    def __init__(self, odds_type_mappings):
+        """
+        :param odds_type_mappings: list of documents from the `ots` collection
+        """
+        self.odds_type_mappings = odds_type_mappings
+        self.version = compute_mapping_version(odds_type_mappings)
+        self._entries_by_key = {}
+        self._entries_by_id = {}
+        self._value_matchers = {}
+
+        for mapping_entry in odds_type_mappings:
+            entry_id = mapping_entry.get('id')
+            if not isinstance(entry_id, str):
+                continue
 
-            elif any(word.replace("-", "").replace(" ", "") in key.lower() for word in
-                     s3) and 'first' not in key.lower():
-                key_name = '3rd Set'
+            self._entries_by_id.setdefault(entry_id, mapping_entry)
+            self._entries_by_key.setdefault(entry_id.lower(), mapping_entry)
+            for alias in mapping_entry.get('maps') or []:
+                if isinstance(alias, str):
+                    self._entries_by_key.setdefault(alias.lower(), mapping_entry)
+
+    def __len__(self):
+        return len(self.odds_type_mappings)
+
+    def __getstate__(self):
+        # Outcome matchers are keyed by id(), which only holds within this process
+        state = self.__dict__.copy()
+        state['_value_matchers'] = {}
+        return state
+
+    def resolve(self, odds_key):
+        """
+        Resolve a market label to its canonical odds type
+
+        :param odds_key: str - market label (team names already replaced)
+        :return: list - [ovs or None, standardized key]
+        """
+        mapping_entry = self._entries_by_key.get(odds_key.lower())
+        if mapping_entry is None:
+            return [None, odds_key]
+        return [mapping_entry.get('ovs'), mapping_entry['id']]
+
+    def ovs_for_id(self, entry_id):
+        """
+        Get the `ovs` list of the mapping entry with the given canonical id
+
+        :param entry_id: str - canonical odds type id
+        :return: list or None
+        """
+        mapping_entry = self._entries_by_id.get(entry_id)
+        return mapping_entry.get('ovs') if mapping_entry else None
+
+    def value_matcher(self, value_mappings):
+        """
+        Get the compiled outcome matcher for an `ovs` list returned by resolve()
+        Each list is compiled once and reused for every outcome of every match
+
+        :param value_mappings: list - `ovs` entries
+        :return: OutcomeValueMatcher
+        """
+        cached = self._value_matchers.get(id(value_mappings))
+        # Keep a reference to the list so its id() can't be reused by another object
+        if cached is None or cached[0] is not value_mappings:
+            cached = (value_mappings, OutcomeValueMatcher(value_mappings))
+            self._value_matchers[id(value_mappings)] = cached
+        return cached[1]
+
+
+def _country_key(country_name):
+    return country_name.strip().lower().replace(' ', '-')
+
+
+class CountryIndex:
+    """
+    Hash index over the `cos` country documents
+    Ids, `maps` aliases, English titles and ISO codes all point at the
+    canonical country id, so resolving a country label is one dict lookup.
+    Names win over ISO codes when both use the same key.
+    """
 
-            elif any(word.replace("-", "").replace(" ", "") in key.lower() for word in
-                     s4) and 'first' not in key.lower():
-                key_name = '4th Set'
+    def __init__(self, country_data):
+        """
+        :param country_data: list of documents from the `cos` collection
+        """
+        self.country_data = country_data
+        self._country_ids_by_key = {}
+
+        name_keys = []
+        iso_keys = []
+        for country_info in country_data:
+            country_id = country_info.get('id')
+            if not isinstance(country_id, str) or not country_id:
+                continue
 
-            elif any(word.replace("-", "").replace(" ", "") in key.lower() for word in
-                     s5) and 'first' not in key.lower():
-                key_name = '5th Set'
+            name_keys.append((country_id, country_id))
+            for alias in country_info.get('maps') or []:
+                if isinstance(alias, str) and alias:
+                    name_keys.append((alias, country_id))
+            title = (country_info.get('titles') or {}).get('en')
+            if isinstance(title, str) and title:
+                name_keys.append((title, country_id))
+            for iso_field in ['iso2', 'iso3']:
+                iso_code = country_info.get(iso_field)
+                if isinstance(iso_code, str) and iso_code:
+                    iso_keys.append((iso_code, country_id))
+
+        for country_name, country_id in name_keys + iso_keys:
+            self._country_ids_by_key.setdefault(_country_key(country_name), country_id)
+
+    def __len__(self):
+        return len(self.country_data)
+
+    def resolve(self, country_name):
+        """
+        Resolve a country label to its canonical `cos` id
+
+        :param country_name: str - country name, alias or ISO code (e.g., 'Italy', 'ITA')
+        :return: str or None - canonical country id, None if unknown
+        """
+        if not isinstance(country_name, str):
+            return None
+        return self._country_ids_by_key.get(_country_key(country_name))
 
-            else:
-                key_name = 'Full Match'
-
-
-
-        elif 'inning' in key.lower():
-
-            i1 = ['1st inning', 'first inning', 'one inning', 'inning 1', 'inning one',
-                  'inning no. 1', 'inning number 1', 'inning no.1']
-            i2 = ['2nd inning', 'second inning', 'two inning', 'inning 2', 'inning two',
-                  'inning no. 2', 'inning number 2', 'inning no.2']
-            i3 = ['3rd inning', 'third inning', 'three inning', 'inning 3', 'inning third',
-                  'inning no. 3', 'inning number 3', 'inning no.3']
-            i4 = ['4th inning', 'fourth inning', 'four inning', 'inning 4', 'inning fourth',
-                  'inning no. 4', 'inning number 4', 'inning no.4']
-            i5 = ['5th inning', 'fifth inning', 'five inning', 'inning 5', 'inning fifth',
-                  'inning no. 5', 'inning number 5', 'inning no.5']
-            i6 = ['6th inning', 'sixth inning', 'six inning', 'inning 6', 'inning sixth',
-                  'inning no. 6', 'inning number 6', 'inning no.6']
-            i7 = ['7th inning', 'seventh inning', 'seven inning', 'inning 7',
-                  'inning seventh', 'inning no. 7', 'inning number 7', 'inning no.7']
-            i8 = ['8th inning', 'eighth inning', 'eight inning', 'inning 8',
-                  'inning eighth', 'inning no. 8', 'inning number 8', 'inning no.8']
-            i9 = ['9th inning', 'ninth inning', 'nine inning', 'inning 9', 'inning ninth',
-                  'inning no. 9', 'inning number 9', 'inning no.9']
-            if any(word.replace("-", "").replace(" ", "") in key.lower() for word in i1):
-                if 'first inning' in key.lower():
-                    if key.lower().count('first') == 1:
-                        key_name = '1st Inning'
 
-                    else:
-                        key_name = 'Full Match'
-                elif 'first' in key.lower():
-                    key_name = 'Full Match'
-                else:
-                    key_name = '1st Inning'
+MappingSnapshot = namedtuple(
+    'MappingSnapshot', ['version', 'odds_type_mappings', 'odds_mapping_resolver', 'country_data', 'country_index']
+)
 
-            elif any(word.replace("-", "").replace(" ", "") in key.lower() for word in
-                     i2) and 'first' not in key.lower():
-                key_name = '2nd Inning'
 
+def build_mapping_snapshot(odds_type_mappings, country_data):
+    """
+    Build every index derived from the `ots` and `cos` documents
 
-            elif any(word.replace("-", "").replace(" ", "") in key.lower() for word in
-                     i3) and 'first' not in key.lower():
-                key_name = '3rd Inning'
+    :param odds_type_mappings: list of documents from the `ots` collection
+    :param country_data: list of documents from the `cos` collection
+    :return: MappingSnapshot
+    """
+    odds_mapping_resolver = OddsMappingResolver(odds_type_mappings)
+    country_index = CountryIndex(country_data)
+    version = f"ots={odds_mapping_resolver.version};cos={compute_mapping_version(country_data)}"
+    return MappingSnapshot(version, odds_type_mappings, odds_mapping_resolver, country_data, country_index)
 
 
-            elif any(word.replace("-", "").replace(" ", "") in key.lower() for word in
-                     i4) and 'first' not in key.lower():
-                key_name = '4th Inning'
+# Next to this module, Airflow tasks don't run from the repository root
+MAPPING_DUMP_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'json_files')
+MAPPING_SNAPSHOT_FILE = os.path.join(MAPPING_DUMP_DIRECTORY, 'mapping_snapshot.pickle')
+MAPPING_SNAPSHOT_FORMAT = 1
 
 
-            elif any(word.replace("-", "").replace(" ", "") in key.lower() for word in
-                     i5) and 'first' not in key.lower():
-                key_name = '5th Inning'
+def build_mapping_snapshot_from_dumps(dump_directory=MAPPING_DUMP_DIRECTORY):
+    """
+    Build a MappingSnapshot from the Mongo-export dumps `ots.json` and `cos.json`
+    Extended JSON values ($oid, $date) are decoded, so the version stamp is the
+    same as for the collections the dumps were taken from
 
+    :param dump_directory: str - directory holding the dumps
+    :return: MappingSnapshot
+    """
+    with open(os.path.join(dump_directory, 'ots.json'), encoding='utf-8') as ots_file:
+        odds_type_mappings = json_util.loads(ots_file.read())
+    with open(os.path.join(dump_directory, 'cos.json'), encoding='utf-8') as cos_file:
+        country_data = json_util.loads(cos_file.read())
+    return build_mapping_snapshot(odds_type_mappings, country_data)
 
-            elif any(word.replace("-", "").replace(" ", "") in key.lower() for word in
-                     i6) and 'first' not in key.lower():
-                key_name = '6th Inning'
 
+def save_mapping_snapshot(snapshot, snapshot_file=MAPPING_SNAPSHOT_FILE):
+    """
+    Serialize a MappingSnapshot with all its prebuilt indexes
+    Written to a temporary file first, so readers never load a partial file
 
-            elif any(word.replace("-", "").replace(" ", "") in key.lower() for word in
-                     i7) and 'first' not in key.lower():
-                key_name = '7th Inning'
+    :param snapshot: MappingSnapshot
+    :param snapshot_file: str - path of the snapshot file
+    """
+    temporary_file = f"{snapshot_file}.tmp"
+    with open(temporary_file, 'wb') as output_file:
+        pickle.dump({'format': MAPPING_SNAPSHOT_FORMAT, 'snapshot': snapshot}, output_file,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_file, snapshot_file)
 
 
-            elif any(word.replace("-", "").replace(" ", "") in key.lower() for word in
-                     i8) and 'first' not in key.lower():
-                key_name = '8th Inning'
+def load_mapping_snapshot(snapshot_file=MAPPING_SNAPSHOT_FILE):
+    """
+    Load a snapshot written by save_mapping_snapshot()
 
+    :param snapshot_file: str - path of the snapshot file
+    :return: MappingSnapshot or None - None if the file is missing or from another format
+    """
+    if not os.path.exists(snapshot_file):
+        return None
+    with open(snapshot_file, 'rb') as input_file:
+        stored = pickle.load(input_file)
+    if not isinstance(stored, dict) or stored.get('format') != MAPPING_SNAPSHOT_FORMAT:
+        return None
+    return stored['snapshot']
 
-            elif any(word.replace("-", "").replace(" ", "") in key.lower() for word in
-                     i9) and 'first' not in key.lower():
-                key_name = '9th Inning'
 
+class MappingSnapshotService:
+    """
+    Process-wide holder of the current MappingSnapshot
+    `ots` and `cos` are loaded once per process. A background thread compares
+    their version stamps every REFRESH_INTERVAL_SECONDS and, only when one
+    changed, builds a new snapshot and swaps it in with a single assignment.
+    Readers take `service.snapshot` and never see a half-built index.
+
+    With a snapshot file, start-up reads the prebuilt indexes from that file
+    (derived from the `json_files` dumps the first time) and only rescans the
+    collections when their version stamp differs. If Mongo can't be reached
+    the file snapshot is used as is.
+    """
 
-            else:
-                key_name = 'Full Match'
+    REFRESH_INTERVAL_SECONDS = 300
+
+    def __init__(self, betting_database, logger=None, snapshot_file=None):
+        """
+        :param betting_database: MongoDB database holding `ots` and `cos`
+        :param logger: logger object
+        :param snapshot_file: str - path of the local snapshot file, None to always load from Mongo
+        """
+        self.betting_database = betting_database
+        self.logger = logger
+        self.snapshot_file = snapshot_file
+        if snapshot_file:
+            self.snapshot = self._load_initial_snapshot()
+        else:
+            self.snapshot = self._load_snapshot()
 
+        self._stop_event = threading.Event()
+        self._refresh_thread = None
 
-        elif 'period' in key.lower():
+    def _load_snapshot(self):
+        odds_type_mappings = list(self.betting_database['ots'].find())
+        country_data = list(self.betting_database['cos'].find())
+        return build_mapping_snapshot(odds_type_mappings, country_data)
 
-            p1 = ['1st period', 'first period', 'one period', 'period 1', 'period one',
-                  'period no. 1', 'period number 1', 'period no.1']
-            p2 = ['2nd period', 'second period', 'two period', 'period 2', 'period two',
-                  'period no. 2', 'period number 2', 'period no.2']
-            p3 = ['3rd period', 'third period', 'three period', 'period 3', 'period third',
-                  'period no. 3', 'period number 3', 'period no.3']
+    def _load_initial_snapshot(self):
+        """Start from the local snapshot file, going to Mongo only if it is stale"""
+        snapshot = None
+        try:
+            snapshot = load_mapping_snapshot(self.snapshot_file)
+            if snapshot is None:
+                snapshot = build_mapping_snapshot_from_dumps(os.path.dirname(self.snapshot_file) or '.')
+                self._save_snapshot(snapshot)
+        except Exception as file_error:
+            self._log('MAPPING_SNAPSHOT_FILE_ERROR', f'Cannot use {self.snapshot_file}', error=file_error)
 
-            if any(word.replace("-", "").replace(" ", "") in key.lower() for word in p1):
-                if 'first period' in key.lower():
-                    if key.lower().count('first') == 1:
-                        key_name = '1st period'
+        try:
+            current_version = self.current_version()
+        except Exception as version_error:
+            if snapshot is None:
+                raise
+            self._log('MAPPING_SNAPSHOT_OFFLINE', f'Using file snapshot {snapshot.version}', error=version_error)
+            return snapshot
+
+        if snapshot is not None and snapshot.version == current_version:
+            self._log('MAPPING_SNAPSHOT_FILE_LOADED', f'{self.snapshot_file} is up to date ({snapshot.version})')
+            return snapshot
+
+        snapshot = self._load_snapshot()
+        self._save_snapshot(snapshot)
+        return snapshot
+
+    def _save_snapshot(self, snapshot):
+        if not self.snapshot_file:
+            return
+        try:
+            save_mapping_snapshot(snapshot, self.snapshot_file)
+        except Exception as save_error:
+            self._log('MAPPING_SNAPSHOT_SAVE_ERROR', f'Cannot write {self.snapshot_file}', error=save_error)
+
+    def _log(self, stage, details, error=None):
+        if self.logger:
+            log_scraper_progress(self.logger, stage, details, error=error)
+
+    def current_version(self):
+        """
+        :return: str - version stamp of `ots` and `cos` as stored right now
+        """
+        return (f"ots={fetch_mapping_version(self.betting_database['ots'])};"
+                f"cos={fetch_mapping_version(self.betting_database['cos'])}")
+
+    def refresh(self):
+        """
+        Rebuild the snapshot if `ots` or `cos` changed since it was loaded
+
+        :return: bool - True if a new snapshot was swapped in
+        """
+        if self.current_version() == self.snapshot.version:
+            return False
 
-                    else:
-                        key_name = 'Full Match'
-                elif 'first' in key.lower():
-                    key_name = 'Full Match'
-                else:
-                    key_name = '1st period'
+        previous_version = self.snapshot.version
+        self.snapshot = self._load_snapshot()
+        self._save_snapshot(self.snapshot)
 
-            elif any(word.replace("-", "").replace(" ", "") in key.lower() for word in
-                     p2) and 'first' not in key.lower():
-                key_name = '2nd period'
+        self._log('MAPPING_SNAPSHOT_REFRESHED', f'Mapping snapshot {previous_version} -> {self.snapshot.version}')
+        return True
 
+    def start_background_refresh(self, interval_seconds=None):
+        """
+        Start the daemon thread polling for mapping changes (no-op if already running)
 
-            elif any(word.replace("-", "").replace(" ", "") in key.lower() for word in
-                     p3) and 'first' not in key.lower():
-                key_name = '3rd period'
+        :param interval_seconds: int - seconds between version checks
+        """
+        if self._refresh_thread is not None:
+            return
 
+        self._refresh_thread = threading.Thread(
+            target=self._refresh_loop,
+            args=(interval_seconds or self.REFRESH_INTERVAL_SECONDS,),
+            name='mapping-snapshot-refresh',
+            daemon=True
+        )
+        self._refresh_thread.start()
 
-            else:
-                key_name = 'Full Match'
+    def _refresh_loop(self, interval_seconds):
+        while not self._stop_event.wait(interval_seconds):
+            try:
+                self.refresh()
+            except Exception as refresh_error:
+                self._log(
+                    'MAPPING_SNAPSHOT_REFRESH_ERROR', f'Keeping mapping snapshot {self.snapshot.version}',
+                    error=refresh_error
+                )
+
+    def stop(self):
+        """Stop the background refresh thread"""
+        self._stop_event.set()
+
+
+_mapping_snapshot_service = None
+_mapping_snapshot_service_lock = threading.Lock()
+
+
+def get_mapping_snapshot_service(betting_database, logger=None, snapshot_file=MAPPING_SNAPSHOT_FILE):
+    """
+    Get the process-wide MappingSnapshotService, loading it on first use
+    Every spider in the process shares the same snapshot and refresh thread
+
+    :param betting_database: MongoDB database holding `ots` and `cos`
+    :param logger: logger object
+    :param snapshot_file: str - local snapshot file used at start-up, None to load from Mongo
+    :return: MappingSnapshotService
+    """
+    global _mapping_snapshot_service
+
+    with _mapping_snapshot_service_lock:
+        if _mapping_snapshot_service is None:
+            mapping_snapshot_service = MappingSnapshotService(betting_database, logger, snapshot_file)
+            mapping_snapshot_service.start_background_refresh()
+            _mapping_snapshot_service = mapping_snapshot_service
+            if logger:
+                log_scraper_progress(
+                    logger, 'MAPPING_SNAPSHOT_LOADED',
+                    f'Mapping snapshot {mapping_snapshot_service.snapshot.version}'
+                )
+
+    return _mapping_snapshot_service
+
+
+class TeamNameAnonymizer:
+    """
+    Per-event substitution of competitor names by 'home' / 'away'
+    All aliases of both competitors are compiled into one alternation, longest
+    first, so every market and outcome label of the event is rewritten in a
+    single pass. Empty aliases are skipped and an alias given for both sides
+    stays with the home side.
+    """
+
+    def __init__(self, home_names, away_names):
+        """
+        :param home_names: list - names of the first competitor (full, short, description, ...)
+        :param away_names: list - names of the second competitor
+        """
+        replacements = {}
+        for team_names, replacement in [(home_names, 'home'), (away_names, 'away')]:
+            for team_name in team_names:
+                if team_name:
+                    replacements.setdefault(team_name, replacement)
+
+        self._replacements = replacements
+        self._pattern = None
+        if replacements:
+            self._pattern = re.compile(
+                '|'.join(re.escape(team_name) for team_name in sorted(replacements, key=len, reverse=True))
+            )
+
+    def anonymize(self, label):
+        """
+        :param label: str - market or outcome label
+        :return: str - label with competitor names replaced
+        """
+        if self._pattern is None:
+            return label
+        return self._pattern.sub(lambda name_match: self._replacements[name_match.group(0)], label)
+
+
+_NOT_USED_MARKET_WORDS = [
+    'scoreless', 'end', 'go', 'never', 'niether', 'total runs', 'to score', 'get', 'including overtime', 'own',
+    'retain', ':', '0:', 'award', 'kick', 'penalty', 'target', 'shots', 'series', 'yellow', 'super over', 'header',
+    '4s', 'touchdown', 'of the match', 'hero', 'tries', 'more', '6s', 'fifty', 'scored', 'century', 'last',
+    "player's total runs", 'given', 'red', 'retain', 'most', 'odd/even', 'performance', 'converted', 'listed',
+    'center', 'margin', 'try', 'either', 'hc ', 'runs ', 'rushing', 'out', 'yards', 'receving', 'both', 'and',
+    'remaining', '(', ')', 'tie', 'break', 'deuce', 'next', 'touchdowns', 'range', 'will', '?', 'did', 'does',
+    'hour', 'minute', 'halves', 'scorer', 'betting', '&', '1 .ht', '1. ht', '1.ht', 'number of runs in match',
+    'how', 'which', 'who', 'result', 'win', 'halftime', 'legs', 'half time', 'full time', 'tackles', 'attempts',
+    'final', 'frame', 'side', 'wides', 'highest', 'four', 'sixes', 'assists', 'made', 'home', 'away', 'rebounds',
+    'milestones', 'qualify', 'exact', 'bottom', 'top', 'wicket', 'at least', 'at end', 'at the end', 'before',
+    'after', 'fulltime', 'lead', 'race', 'stats', 'specials', 'squares', 'puck', 'record'
+]
+
+# One alternation over every excluded word, longest first, built once at import
+_NOT_USED_MARKET_PATTERN = re.compile(
+    '|'.join(re.escape(word) for word in sorted(set(_NOT_USED_MARKET_WORDS), key=len, reverse=True))
+)
+
+
+def check_key(name):
+    """
+    Check whether a market name should be scraped
+    The name is lowercased once and all excluded words are searched in a single
+    regex pass instead of one substring scan per word
+
+    :param name: str - market name (team names already replaced)
+    :return: bool - True if the market is used
+    """
+    name = name.lower()
+
+    if _NOT_USED_MARKET_PATTERN.search(name):
+        return False
+    if '2-way & over/under' in name:
+        return False
+    if 'half' not in name and 'first' in name:
+        return False
+    if 'point spread' in name and 'o/u' in name:
+        return False
+    return 'winner' not in name
+
+
+SUPPORTED_SPORT_IDS = frozenset([
+    'rugby', 'football', 'soccer', 'tennis', 'basketball', 'hockey', 'americanfootball', 'baseball', 'handball',
+    'rugbyunion', 'floorball', 'bandy', 'futsal', 'volleyball', 'cricket', 'snooker', 'beachvolleyball',
+    'aussierules', 'rugbyleague', 'badminton', 'waterpolo', 'fieldhockey', 'tabletennis', 'beachsoccer', 'netball',
+    'pesapallo', 'kabaddi'
+])
+
+# Bookmaker-specific sport labels that name a different sport than they say
+BOOKMAKER_SPORT_ALIASES = {
+    'tipico': {'football': 'soccer', 'esports': 'soccer', 'rugby': 'rugby league'},
+    'unibet': {'football': 'soccer'},
+    'bovada': {'football': 'handball'},
+}
+
+
+def normalize_bookmaker_sport(sport_name, bookmaker):
+    """
+    Translate a bookmaker sport label to the sport name we store
+
+    :param sport_name: str - sport label as shown by the bookmaker
+    :param bookmaker: str - bookmaker name (e.g., 'tipico')
+    :return: str - sport name
+    """
+    sport_name = sport_name.strip()
+    return BOOKMAKER_SPORT_ALIASES.get(bookmaker, {}).get(sport_name.lower(), sport_name)
+
+
+@lru_cache(maxsize=1024)
+def canonical_sport_id(sport_name, bookmaker=None):
+    """
+    Canonical sport id for a bookmaker or Flashscore sport label
+    Ids are lowercased with spaces and dashes removed, and interned so matching
+    can compare them without re-normalizing ('American Football' -> 'americanfootball')
+
+    :param sport_name: str - sport label
+    :param bookmaker: str - bookmaker name, None for labels that need no translation
+    :return: str - canonical sport id
+    """
+    if bookmaker:
+        sport_name = normalize_bookmaker_sport(sport_name, bookmaker)
+    return sys.intern(sport_name.replace('-', '').replace(' ', '').lower())
+
+
+def check_sport_name(sport_name):
+    return canonical_sport_id(sport_name) in SUPPORTED_SPORT_IDS
+
+
+_PERIOD_KEY_SUFFIXES = ['-half-1', '-half-2', '-one-half', '-period-1', '-period-2', '-period-3', '-set-1', '-set-2',
+                        '-set-3', '-set-4', '-set-5', '-quarter-1', '-quarter-2', '-quarter-3', '-quarter-4',
+                        '-inning-1', '-inning-2', '-inning-3', '-inning-4', '-inning-5', '-inning-6', '-inning-7',
+                        '-inning-8', '-inning-9']
+
+_FULL_MATCH_HEADER_WORDS = ['top', 'wicket', 'halftime', 'at least', 'at end', 'at the end',
+                            'before', 'after', 'fulltime', 'lead']
+
+# (trigger words, [(header, spellings), ...]) - checked in order, first hit wins
+_PERIOD_HEADER_TABLE = [
+    (['half', '. h', ' .h'], [
+        ('1st Half', ['1sthalf', 'firsthalf', '1h', 'halfnumber1', 'halfno1', 'half1', '1half']),
+        ('2nd Half', ['2ndhalf', 'secondhalf', '2h', 'halfnumber2', 'halfno2', 'half2', '2half']),
+    ]),
+    (['quarter'], [
+        ('1st Quarter', ['1stquarter', 'quarter1', 'quarterone', 'firstquarter', '1quarter', 'quarterno1',
+                         'quarternumber1', 'quarter no.1']),
+        ('2nd Quarter', ['2ndquarter', 'quarter2', 'quartertwo', 'secondquarter', '2quarter', 'quarterno2',
+                         'quarternumber2', 'quarter no.2']),
+        ('3rd Quarter', ['3rdquarter', 'quarter3', 'quarterthree', 'thirdquarter', '3quarter', 'quarterno3',
+                         'quarternumber3', 'quarter no.3']),
+        ('4th Quarter', ['4thquarter', 'quarter4', 'quarterfour', 'fourthquarter', '4quarter', 'quarterno4',
+                         'quarternumber4', 'quarter no.4']),
+    ]),
+    (['set'], [
+        ('1st Set', ['1st set', 'set 1', 'set one', 'first set', 'set no. 1', 'set number 1', '1.set', '1 .set',
+                     '1. set', 'set no.1']),
+        ('2nd Set', ['2nd set', 'set 2', 'set two', 'second set', 'set no. 2', 'set number 2', '2.set', '2 .set',
+                     '2. set', 'set no.2']),
+        ('3rd Set', ['3rd set', 'set 3', 'set three', 'third set', 'set no. 3', 'set number 3', '3.set', '3 .set',
+                     '3. set', 'set no.3']),
+        ('4th Set', ['4th set', 'set 4', 'set four', 'fourth set', 'set no. 4', 'set number 4', '4.set', '4 .set',
+                     '4. set', 'set no.4']),
+        ('5th Set', ['5th set', 'set 5', 'set five', 'fifth set', 'set no. 5', 'set number 5', '5.set', '5 .set',
+                     '5. set', 'set no.5']),
+    ]),
+    (['inning'], [
+        ('1st Inning', ['1st inning', 'first inning', 'one inning', 'inning 1', 'inning one', 'inning no. 1',
+                        'inning number 1', 'inning no.1']),
+        ('2nd Inning', ['2nd inning', 'second inning', 'two inning', 'inning 2', 'inning two', 'inning no. 2',
+                        'inning number 2', 'inning no.2']),
+        ('3rd Inning', ['3rd inning', 'third inning', 'three inning', 'inning 3', 'inning third', 'inning no. 3',
+                        'inning number 3', 'inning no.3']),
+        ('4th Inning', ['4th inning', 'fourth inning', 'four inning', 'inning 4', 'inning fourth', 'inning no. 4',
+                        'inning number 4', 'inning no.4']),
+        ('5th Inning', ['5th inning', 'fifth inning', 'five inning', 'inning 5', 'inning fifth', 'inning no. 5',
+                        'inning number 5', 'inning no.5']),
+        ('6th Inning', ['6th inning', 'sixth inning', 'six inning', 'inning 6', 'inning sixth', 'inning no. 6',
+                        'inning number 6', 'inning no.6']),
+        ('7th Inning', ['7th inning', 'seventh inning', 'seven inning', 'inning 7', 'inning seventh',
+                        'inning no. 7', 'inning number 7', 'inning no.7']),
+        ('8th Inning', ['8th inning', 'eighth inning', 'eight inning', 'inning 8', 'inning eighth',
+                        'inning no. 8', 'inning number 8', 'inning no.8']),
+        ('9th Inning', ['9th inning', 'ninth inning', 'nine inning', 'inning 9', 'inning ninth', 'inning no. 9',
+                        'inning number 9', 'inning no.9']),
+    ]),
+    (['period'], [
+        ('1st period', ['1st period', 'first period', 'one period', 'period 1', 'period one', 'period no. 1',
+                        'period number 1', 'period no.1']),
+        ('2nd period', ['2nd period', 'second period', 'two period', 'period 2', 'period two', 'period no. 2',
+                        'period number 2', 'period no.2']),
+        ('3rd period', ['3rd period', 'third period', 'three period', 'period 3', 'period third', 'period no. 3',
+                        'period number 3', 'period no.3']),
+    ]),
+]
+
+
+def _strip_header_spacing(text):
+    return text.replace(' ', '').replace('-', '').lower()
+
+
+# Same table with every spelling pre-normalized, so lookups never re-strip tokens
+_COMPILED_PERIOD_HEADER_TABLE = [
+    (
+        [_strip_header_spacing(word) for word in trigger_words],
+        [(header, [_strip_header_spacing(word) for word in spellings]) for header, spellings in period_headers]
+    )
+    for trigger_words, period_headers in _PERIOD_HEADER_TABLE
+]
+
+
+@lru_cache(maxsize=4096)
+def _classify_header_name(key):
+    stripped_key = key
+    for suffix in _PERIOD_KEY_SUFFIXES:
+        stripped_key = stripped_key.replace(suffix, '')
+
+    lowered_key = key.lower()
+    if any(word in lowered_key for word in _FULL_MATCH_HEADER_WORDS):
+        return 'Full Match', stripped_key
+
+    # 'first' anywhere means the whole match (e.g. 'first team to score')
+    normalized_key = _strip_header_spacing(key)
+    if 'first' in normalized_key:
+        return 'Full Match', stripped_key
+
+    for trigger_words, period_headers in _COMPILED_PERIOD_HEADER_TABLE:
+        if any(word in normalized_key for word in trigger_words):
+            for header, spellings in period_headers:
+                if any(word in normalized_key for word in spellings):
+                    return header, stripped_key
+            return 'Full Match', stripped_key
+
+    return 'Full Match', stripped_key
+
+
+def check_header_name(key):
+    """
+    Classify a market key into its period header (1st Half, 2nd Set, ...)
+    Results are memoized because the same market keys repeat across thousands of matches
+
+    :param key: str - standardized market key
+    :return: list - [header name, key with period suffix removed]
+    """
+    return list(_classify_header_name(key))
+
+
+# Bump when check_key, check_header_name or a spider's market filter changes,
+# so persisted classifications computed by the old rules are discarded
+MARKET_CLASSIFICATION_RULES_VERSION = 1
+
+MarketClassification = namedtuple('MarketClassification', ['valid', 'ovs', 'key', 'header', 'final_key'])
+
+
+class MarketClassificationCache:
+    """
+    Persistent classification of raw market labels per bookmaker
+    Stores the outcome of market filter -> odds mapping -> header classification
+    in the `market_classifications` collection, keyed by (bookmaker, version,
+    label). Only entries of the current `ots` version are loaded, and they are
+    reloaded when it changes, including when the mapping snapshot is refreshed
+    mid-run. Processes on different versions (prematch and live) keep their own
+    entries; a TTL index removes entries not written for ENTRY_MAX_AGE.
+    """
+
+    ENTRY_MAX_AGE = timedelta(days=30)
+
+    def __init__(self, collection, bookmaker, mapping_snapshots, logger=None):
+        """
+        :param collection: MongoDB collection holding the classifications
+        :param bookmaker: str - bookmaker name (e.g., 'tipico')
+        :param mapping_snapshots: MappingSnapshotService providing the current `ots` resolver
+        :param logger: logger object
+        """
+        self.collection = collection
+        self.bookmaker = bookmaker
+        self.mapping_snapshots = mapping_snapshots
+        self.logger = logger
+        self.odds_mapping_resolver = mapping_snapshots.snapshot.odds_mapping_resolver
+        self.version = self._version_for(self.odds_mapping_resolver)
+
+        self._classifications = {}
+        self._new_labels = []
+        self.hits = 0
+        self.misses = 0
+
+        self._load()
+
+    @staticmethod
+    def _version_for(odds_mapping_resolver):
+        return f"{MARKET_CLASSIFICATION_RULES_VERSION}:{odds_mapping_resolver.version}"
+
+    def _use_resolver(self, odds_mapping_resolver):
+        """Switch to the resolver of a refreshed snapshot, reloading if `ots` changed"""
+        self.odds_mapping_resolver = odds_mapping_resolver
+        version = self._version_for(odds_mapping_resolver)
+        if version == self.version:
+            # Only `cos` changed, stored classifications are still valid
+            return
+
+        self.version = version
+        self._classifications = {}
+        self._new_labels = []
+        self._load()
+
+    def _create_indexes(self):
+        try:
+            # Older deployments keyed entries without the version, one process' version overwrote the other's
+            self.collection.drop_index('bookmaker_1_label_1')
+        except Exception:
+            pass
+        self.collection.create_index([('bookmaker', 1), ('version', 1), ('label', 1)], unique=True)
+        self.collection.create_index('updatedAt', expireAfterSeconds=int(self.ENTRY_MAX_AGE.total_seconds()))
+
+    def _load(self):
+        """Bulk load stored classifications for the current version"""
+        try:
+            self._create_indexes()
+
+            stored_classifications = self.collection.find(
+                {'bookmaker': self.bookmaker, 'version': self.version},
+                {'_id': 0, 'label': 1, 'valid': 1, 'key': 1, 'header': 1, 'final_key': 1, 'ovs_ref': 1}
+            )
+            for stored in stored_classifications:
+                ovs_ref = stored.get('ovs_ref')
+                self._classifications[stored['label']] = MarketClassification(
+                    stored['valid'],
+                    self.odds_mapping_resolver.ovs_for_id(ovs_ref) if ovs_ref else None,
+                    stored.get('key'),
+                    stored.get('header'),
+                    stored.get('final_key')
+                )
+        except Exception as load_error:
+            if self.logger:
+                log_scraper_progress(
+                    self.logger, 'MARKET_CACHE_LOAD_ERROR',
+                    'Starting with an empty market classification cache',
+                    error=load_error
+                )
+
+        if self.logger:
+            log_scraper_progress(
+                self.logger, 'MARKET_CACHE_LOADED',
+                f'Loaded {len(self._classifications)} {self.bookmaker} market classifications'
+            )
+
+    def classify(self, label, is_valid_market):
+        """
+        Classify a market label, computing and remembering it on first sight
+
+        :param label: str - market label after home/away substitution
+        :param is_valid_market: callable - the spider's market filter (label -> bool)
+        :return: MarketClassification
+        """
+        odds_mapping_resolver = self.mapping_snapshots.snapshot.odds_mapping_resolver
+        if odds_mapping_resolver is not self.odds_mapping_resolver:
+            self._use_resolver(odds_mapping_resolver)
+
+        classification = self._classifications.get(label)
+        if classification is not None:
+            self.hits += 1
+            return classification
+
+        self.misses += 1
+        if is_valid_market(label):
+            odds_value_mappings, standardized_key = self.odds_mapping_resolver.resolve(label)
+            header, final_key = check_header_name(standardized_key)
+            classification = MarketClassification(True, odds_value_mappings, standardized_key, header, final_key)
         else:
-            key_name = 'Full Match'
+            classification = MarketClassification(False, None, label, None, None)
+
+        self._classifications[label] = classification
+        self._new_labels.append(label)
+        return classification
+
+    def flush(self):
+        """Write classifications of labels seen for the first time in this run"""
+        if not self._new_labels:
+            return
+
+        operations = []
+        for label in self._new_labels:
+            classification = self._classifications[label]
+            operations.append(UpdateOne(
+                {'bookmaker': self.bookmaker, 'version': self.version, 'label': label},
+                {'$set': {
+                    'valid': classification.valid,
+                    'key': classification.key,
+                    'header': classification.header,
+                    'final_key': classification.final_key,
+                    'ovs_ref': classification.key if classification.ovs is not None else None,
+                    'updatedAt': datetime.now(pytz.UTC),
+                }},
+                upsert=True
+            ))
 
-    else:
-        key_name = 'Full Match'
-    return [key_name, original_key]
+        execute_bulk_write_operations(self.collection, operations, "market_classifications", self.logger)
+        self._new_labels = []
+
+
+# Club-type tokens that bookmakers and Flashscore add or leave out freely
+_COMPETITOR_NAME_STOPWORDS = frozenset(['fc', 'cf', 'afc', 'sc', 'ac', 'fk', 'sk', 'cd', 'ssc', 'club'])
+# Age-group markers ('U-21', 'U 21', 'Under 21') are kept, written one way, so youth teams never join senior ones
+_YOUTH_MARKER_PATTERN = re.compile(r'\b(?:u|under)[\s-]?(\d{2})\b')
+_NAME_SEPARATOR_PATTERN = re.compile(r'[\W_]+')
+
+
+# Cached forms of a competitor name: normalized for exact keys and trigrams, and the lowercased
+# token set with its tokens sorted and joined for token-set scoring
+CompetitorNameForm = namedtuple('CompetitorNameForm', ['normalized', 'tokens', 'sorted_text'])
+
+
+@lru_cache(maxsize=65536)
+def competitor_name_form(competitor_name):
+    """
+    Every form of a competitor name matching needs, built once per distinct name
+    The normalized name is lowercased, with accents and punctuation removed,
+    club-type tokens (FC, SC, ...) dropped and age-group markers canonicalized
+    ('Bayern München U-19' -> 'bayern munchen u19'). token_set_ratio only depends
+    on the token sets, so the sorted, deduplicated text scores exactly like the
+    original name and rapidfuzz skips most of its own tokenizing on it.
+
+    :param competitor_name: str - competitor name as given by the website
+    :return: CompetitorNameForm
+    """
+    normalized_name = unicodedata.normalize('NFKD', competitor_name)
+    normalized_name = ''.join(char for char in normalized_name if not unicodedata.combining(char)).lower()
+    normalized_name = _YOUTH_MARKER_PATTERN.sub(r' u\1 ', normalized_name)
+    name_tokens = [
+        token for token in _NAME_SEPARATOR_PATTERN.split(normalized_name)
+        if token and token not in _COMPETITOR_NAME_STOPWORDS
+    ]
+
+    tokens = frozenset(sys.intern(token) for token in competitor_name.lower().split())
+    return CompetitorNameForm(' '.join(name_tokens), tokens, sys.intern(' '.join(sorted(tokens))))
+
+
+def normalize_competitor_name(competitor_name):
+    """
+    Normalized competitor name for exact-key matching (see competitor_name_form)
+
+    :param competitor_name: str - competitor name
+    :return: str - normalized name, '' if nothing is left
+    """
+    return competitor_name_form(competitor_name).normalized
+
+
+def _name_trigrams(text):
+    padded_text = f"  {text} "
+    return {padded_text[position:position + 3] for position in range(len(padded_text) - 2)}
+
+
+class CompetitorAliasIndex:
+    """
+    In-memory inverted index over the `competitor_mapping` collection
+    Every alias in `maps` (and the id itself) points at the canonical
+    competitor id, the lowercased Flashscore name, so a bookmaker team name is
+    resolved with one dict lookup before any fuzzy scoring. Aliases learned from
+    confirmed fuzzy matches are `$addToSet` into `competitor_mapping` in batches
+    of WRITE_BATCH_SIZE, through a BackgroundBulkWriter.
+    """
+
+    WRITE_BATCH_SIZE = 100
+    # Minimum token-set score between the two names before an alias is learned
+    ALIAS_SCORE_THRESHOLD = 80.0
+
+    def __init__(self, collection, logger=None):
+        """
+        :param collection: MongoDB `competitor_mapping` collection
+        :param logger: logger object
+        """
+        self.logger = logger
+        self._canonical_by_alias = {}
+        self._new_aliases = []
+        self.learned_count = 0
+        self.bulk_writer = BackgroundBulkWriter(collection, 'competitor_aliases', logger)
+
+        try:
+            for competitor in collection.find({}, {'_id': 0, 'id': 1, 'maps': 1}):
+                canonical_name = competitor.get('id')
+                if not isinstance(canonical_name, str) or not canonical_name:
+                    continue
+                self._canonical_by_alias.setdefault(canonical_name.lower(), canonical_name)
+                for alias in competitor.get('maps') or []:
+                    if isinstance(alias, str) and alias:
+                        self._canonical_by_alias.setdefault(alias.lower(), canonical_name)
+        except Exception as load_error:
+            if self.logger:
+                log_scraper_progress(
+                    self.logger, 'COMPETITOR_ALIAS_LOAD_ERROR', 'Starting without competitor aliases',
+                    error=load_error
+                )
+
+        if self.logger:
+            log_scraper_progress(
+                self.logger, 'COMPETITOR_ALIASES_LOADED', f'Loaded {len(self._canonical_by_alias)} competitor aliases'
+            )
+
+    def resolve(self, competitor_name):
+        """
+        :param competitor_name: str - bookmaker competitor name
+        :return: str - canonical competitor name, or the name itself if unknown
+        """
+        return self._canonical_by_alias.get(competitor_name.lower(), competitor_name)
+
+    def learn(self, competitor_name, fixture_competitor_name):
+        """
+        Remember a bookmaker name confirmed by a fuzzy match as an alias of the Flashscore name
+
+        :param competitor_name: str - bookmaker competitor name
+        :param fixture_competitor_name: str - Flashscore competitor name it was matched to
+        """
+        alias = competitor_name.lower()
+        canonical_name = fixture_competitor_name.lower()
+        if alias in self._canonical_by_alias:
+            return
+        if normalize_competitor_name(alias) == normalize_competitor_name(canonical_name):
+            # The exact join already finds this pair
+            return
+        if fuzz.token_set_ratio(
+                competitor_name_form(alias).sorted_text, competitor_name_form(canonical_name).sorted_text
+        ) < self.ALIAS_SCORE_THRESHOLD:
+            # Only the combined matchup passed, don't trust this side on its own
+            return
+
+        self._canonical_by_alias[alias] = canonical_name
+        self._new_aliases.append({'id': canonical_name, 'maps': [alias]})
+        self.learned_count += 1
+        if len(self._new_aliases) >= self.WRITE_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        """Queue the aliases learned since the last flush for `competitor_mapping`"""
+        if not self._new_aliases:
+            return
+
+        aliases_by_competitor = {}
+        for new_alias in self._new_aliases:
+            aliases_by_competitor.setdefault(new_alias['id'], []).extend(new_alias['maps'])
+        self._new_aliases = []
+        self.bulk_writer.submit([
+            UpdateOne({'id': competitor_id}, {"$addToSet": {"maps": {"$each": aliases}}}, upsert=True)
+            for competitor_id, aliases in aliases_by_competitor.items()
+        ])
+
+    def close(self):
+        """Queue the last aliases and wait for them to be written"""
+        self.flush()
+        self.bulk_writer.close()
+
+
+@lru_cache(maxsize=4096)
+def normalize_league_name(league_name):
+    """
+    Normalized league name for league alignment
+    Lowercased, accents and punctuation removed ('Primera División - Clausura' -> 'primera division clausura')
+
+    :param league_name: str - league or group name
+    :return: str - normalized name, '' if nothing is left
+    """
+    league_name = unicodedata.normalize('NFKD', league_name)
+    league_name = ''.join(char for char in league_name if not unicodedata.combining(char)).lower()
+    return ' '.join(token for token in _NAME_SEPARATOR_PATTERN.split(league_name) if token)
+
+
+def league_country_key(country_id, country_name):
+    """
+    Country part of a league key: the canonical country id, or the country name
+    as a key when it isn't in the country data (international cups, regions)
+
+    :param country_id: str - canonical country id or None
+    :param country_name: str - country name as given by the website
+    :return: str - country key
+    """
+    return country_id or _country_key(country_name or '')
+
+
+class FixtureIndex:
+    """
+    In-memory index of the Flashscore fixtures in `matches_data`
+    The fixture window is loaded once with a projection of only the fields
+    matching needs. Fixtures are also hashed by (sport id, kickoff, normalized
+    competitor names) for an exact join that needs no fuzzy scoring. Per
+    canonical sport id the fixtures are kept sorted by kickoff, so the fuzzy
+    candidates within +/- a tolerance of a bookmaker kickoff are found with two
+    bisections instead of a Mongo query. When kickoffs disagree, a character
+    trigram index over the normalized competitor names per sport gives the
+    fixtures sharing the most trigrams with a bookmaker matchup. The leagues
+    seen per sport and country are kept for LeagueAlignmentCache.
+    Fixtures inserted later are picked up by refresh(), which fetches only
+    documents with an _id above the highest one seen, at most once every
+    REFRESH_INTERVAL_SECONDS.
+    """
+
+    PROJECTION = {
+        '_id': 1, 'match_id': 1, 'sport': 1, 'country': 1, 'country_id': 1, 'group': 1,
+        'competitor1': 1, 'competitor2': 1, 'timestamp': 1
+    }
+    LOOKBACK = timedelta(days=1)
+    REFRESH_INTERVAL_SECONDS = 60
+    # Only the rarest trigrams of a bookmaker matchup are looked up, common ones add nothing but postings
+    MAX_QUERY_TRIGRAMS = 12
+
+    def __init__(self, matches_collection, logger=None):
+        """
+        :param matches_collection: MongoDB collection with the Flashscore fixtures
+        :param logger: logger object
+        """
+        self.matches_collection = matches_collection
+        self.logger = logger
+        self.window_start = datetime.now(pytz.UTC) - self.LOOKBACK
+
+        # Parallel lists per sport id: kickoffs (epoch seconds, ascending) and their fixtures
+        self._kickoffs_by_sport = {}
+        self._fixtures_by_sport = {}
+        self._fixtures_by_exact_key = {}
+        self._latest_by_match_id = {}
+        # Trigram -> fixture numbers per sport, fixture numbers index the three lists below
+        self._trigram_postings_by_sport = {}
+        self._indexed_fixtures = []
+        self._indexed_kickoffs = []
+        self._indexed_is_current = []
+        self._latest_number_by_match_id = {}
+        # (sport id, country key) -> normalized league names
+        self._leagues_by_country = {}
+        self._last_seen_id = None
+        self._last_refresh = 0
+        self.fixture_count = 0
+
+        self.refresh(force=True)
+        if self.logger:
+            log_scraper_progress(
+                self.logger, 'FIXTURE_INDEX_LOADED',
+                f'Indexed {self.fixture_count} fixtures in {len(self._kickoffs_by_sport)} sports'
+            )
+
+    def refresh(self, force=False):
+        """
+        Add fixtures inserted since the last load
+
+        :param force: bool - ignore the refresh interval
+        :return: int - number of fixtures added
+        """
+        now = time.monotonic()
+        if not force and now - self._last_refresh < self.REFRESH_INTERVAL_SECONDS:
+            return 0
+        self._last_refresh = now
+
+        fixture_query = {'timestamp': {'$gte': self.window_start}}
+        if self._last_seen_id is not None:
+            fixture_query['_id'] = {'$gt': self._last_seen_id}
+
+        added_count = 0
+        try:
+            for fixture in self.matches_collection.find(fixture_query, self.PROJECTION):
+                self._add(fixture)
+                added_count += 1
+        except Exception as refresh_error:
+            if self.logger:
+                log_scraper_progress(
+                    self.logger, 'FIXTURE_INDEX_REFRESH_ERROR',
+                    f'Keeping {self.fixture_count} indexed fixtures',
+                    error=refresh_error
+                )
+
+        if added_count and not force and self.logger:
+            log_scraper_progress(self.logger, 'FIXTURE_INDEX_REFRESHED', f'Added {added_count} new fixtures')
+        return added_count
+
+    def _add(self, fixture):
+        sport_id = canonical_sport_id(fixture['sport'])
+        kickoff = normalize_timestamp_for_comparison(fixture['timestamp']).timestamp()
+
+        sport_kickoffs = self._kickoffs_by_sport.setdefault(sport_id, [])
+        sport_fixtures = self._fixtures_by_sport.setdefault(sport_id, [])
+        # bisect_right keeps fixtures with the same kickoff in load order
+        position = bisect.bisect_right(sport_kickoffs, kickoff)
+        sport_kickoffs.insert(position, kickoff)
+        sport_fixtures.insert(position, fixture)
+        self.fixture_count += 1
+
+        exact_key = self._exact_key(sport_id, kickoff, fixture['competitor1'], fixture['competitor2'])
+        if exact_key:
+            self._fixtures_by_exact_key.setdefault(exact_key, fixture)
+
+        fixture_id = fixture.get('_id')
+        if fixture_id is not None and (self._last_seen_id is None or fixture_id > self._last_seen_id):
+            self._last_seen_id = fixture_id
+
+        country_key, league_name = self.league_of(fixture)
+        if league_name:
+            self._leagues_by_country.setdefault((sport_id, country_key), set()).add(league_name)
+
+        fixture_number = len(self._indexed_fixtures)
+        self._indexed_fixtures.append(fixture)
+        self._indexed_kickoffs.append(kickoff)
+        self._indexed_is_current.append(True)
+        trigram_postings = self._trigram_postings_by_sport.setdefault(sport_id, {})
+        for trigram in _name_trigrams(self._matchup_name(fixture['competitor1'], fixture['competitor2'])):
+            trigram_postings.setdefault(trigram, []).append(fixture_number)
+
+        # A changed kickoff or competitor upserts a new document with the same match_id; find() gives no
+        # order, so the document inserted last (highest _id, ObjectIds grow with insertion) is the current fixture
+        previous_number = self._latest_number_by_match_id.get(fixture['match_id'])
+        if previous_number is not None:
+            if not self._inserted_after(fixture, self._indexed_fixtures[previous_number]):
+                self._indexed_is_current[fixture_number] = False
+                return
+            self._indexed_is_current[previous_number] = False
+        self._latest_number_by_match_id[fixture['match_id']] = fixture_number
+        self._latest_by_match_id[fixture['match_id']] = fixture
+
+    @staticmethod
+    def _inserted_after(fixture, other_fixture):
+        fixture_id, other_fixture_id = fixture.get('_id'), other_fixture.get('_id')
+        if fixture_id is None or other_fixture_id is None:
+            return True
+        return fixture_id > other_fixture_id
+
+    @staticmethod
+    def league_of(fixture):
+        """
+        :param fixture: dict - fixture document
+        :return: tuple - (country key, normalized league name) of the fixture
+        """
+        return league_country_key(fixture.get('country_id'), fixture.get('country')), \
+            normalize_league_name(fixture.get('group') or '')
+
+    def leagues(self, sport_id, country_key):
+        """
+        :param sport_id: str - canonical sport id (see canonical_sport_id)
+        :param country_key: str - country key (see league_country_key)
+        :return: set - normalized names of the leagues with indexed fixtures
+        """
+        self.refresh()
+        return self._leagues_by_country.get((sport_id, country_key), set())
+
+    @staticmethod
+    def _matchup_name(competitor1, competitor2):
+        return f"{normalize_competitor_name(competitor1)} {normalize_competitor_name(competitor2)}"
+
+    @staticmethod
+    def _exact_key(sport_id, kickoff, competitor1, competitor2):
+        normalized_competitor1 = normalize_competitor_name(competitor1)
+        normalized_competitor2 = normalize_competitor_name(competitor2)
+        if not normalized_competitor1 or not normalized_competitor2:
+            return None
+        return sport_id, kickoff, normalized_competitor1, normalized_competitor2
+
+    def exact_match(self, sport_id, timestamp, competitor1, competitor2):
+        """
+        Fixture with the same sport, kickoff and normalized competitor names
+
+        :param sport_id: str - canonical sport id (see canonical_sport_id)
+        :param timestamp: datetime - kickoff of the bookmaker event
+        :param competitor1: str - first competitor of the bookmaker event
+        :param competitor2: str - second competitor of the bookmaker event
+        :return: dict or None - fixture document
+        """
+        self.refresh()
+
+        kickoff = normalize_timestamp_for_comparison(timestamp).timestamp()
+        exact_key = self._exact_key(sport_id, kickoff, competitor1, competitor2)
+        if exact_key is None:
+            return None
+        return self._fixtures_by_exact_key.get(exact_key)
+
+    def fixture_by_match_id(self, match_id):
+        """
+        :param match_id: str - Flashscore match id
+        :return: dict or None - newest indexed fixture document with that id
+        """
+        self.refresh()
+        return self._latest_by_match_id.get(match_id)
+
+    def similar_fixtures(self, sport_id, competitor1, competitor2, top_k=5, timestamp=None,
+                         max_kickoff_difference_seconds=None):
+        """
+        Fixtures of a sport whose competitor names share the most trigrams with a bookmaker matchup
+        Candidates only, to be verified with rapidfuzz
+
+        :param sport_id: str - canonical sport id (see canonical_sport_id)
+        :param competitor1: str - first competitor of the bookmaker event
+        :param competitor2: str - second competitor of the bookmaker event
+        :param top_k: int - number of fixtures returned
+        :param timestamp: datetime - kickoff of the bookmaker event, None to ignore kickoffs
+        :param max_kickoff_difference_seconds: int - only fixtures kicking off this close to timestamp
+        :return: list - fixture documents, most shared trigrams first, then closest kickoff first
+        """
+        self.refresh()
+
+        trigram_postings = self._trigram_postings_by_sport.get(sport_id)
+        if not trigram_postings:
+            return []
+
+        query_postings = sorted(
+            (trigram_postings[trigram] for trigram in _name_trigrams(self._matchup_name(competitor1, competitor2))
+             if trigram in trigram_postings),
+            key=len
+        )
+        shared_counts = Counter()
+        for postings in query_postings[:self.MAX_QUERY_TRIGRAMS]:
+            shared_counts.update(postings)
+
+        kickoff = None
+        if timestamp is not None:
+            kickoff = normalize_timestamp_for_comparison(timestamp).timestamp()
+
+        # Superseded documents of a fixture and kickoffs outside the window are never returned
+        candidate_numbers = (
+            fixture_number for fixture_number in shared_counts
+            if self._indexed_is_current[fixture_number] and (
+                kickoff is None or max_kickoff_difference_seconds is None
+                or abs(self._indexed_kickoffs[fixture_number] - kickoff) <= max_kickoff_difference_seconds
+            )
+        )
+        if kickoff is None:
+            ranking_key = shared_counts.__getitem__
+        else:
+            # Same teams meeting twice (doubleheaders) share every trigram, the closer kickoff goes first
+            def ranking_key(fixture_number):
+                return shared_counts[fixture_number], -abs(self._indexed_kickoffs[fixture_number] - kickoff)
+        best_numbers = heapq.nlargest(top_k, candidate_numbers, key=ranking_key)
+        return [self._indexed_fixtures[fixture_number] for fixture_number in best_numbers]
+
+    def candidates(self, sport_id, timestamp, tolerance_seconds=0):
+        """
+        Fixtures of a sport kicking off within +/- tolerance of the given time
+        Closest kickoffs come first, fixtures at the same kickoff keep load order
+
+        :param sport_id: str - canonical sport id (see canonical_sport_id)
+        :param timestamp: datetime - kickoff of the bookmaker event
+        :param tolerance_seconds: int - allowed kickoff difference in seconds
+        :return: list - fixture documents (match_id, sport, competitor1, competitor2, timestamp)
+        """
+        self.refresh()
+
+        sport_kickoffs = self._kickoffs_by_sport.get(sport_id)
+        if not sport_kickoffs:
+            return []
+
+        kickoff = normalize_timestamp_for_comparison(timestamp).timestamp()
+        first = bisect.bisect_left(sport_kickoffs, kickoff - tolerance_seconds)
+        last = bisect.bisect_right(sport_kickoffs, kickoff + tolerance_seconds)
+        if first == last:
+            return []
+
+        sport_fixtures = self._fixtures_by_sport[sport_id]
+        if not tolerance_seconds:
+            return sport_fixtures[first:last]
+
+        positions = sorted(range(first, last), key=lambda position: abs(sport_kickoffs[position] - kickoff))
+        return [sport_fixtures[position] for position in positions]
 
 
 def compare_matchups(
@@ -699,6 +2299,937 @@ def compare_matchups(
     # return result
     check = True if sim_combined_set >= 80 else False
     return check
+
+
+def fixture_signature(fixture):
+    """
+    Kickoff and competitors of a fixture, the fields a bookmaker event link depends on
+
+    :param fixture: dict - fixture document
+    :return: str - signature
+    """
+    kickoff = int(normalize_timestamp_for_comparison(fixture['timestamp']).timestamp())
+    return f"{kickoff}|{fixture['competitor1']}|{fixture['competitor2']}"
+
+
+class MatchLinkCache:
+    """
+    Persistent bookmaker event id -> Flashscore match_id links
+    Loaded from the `match_links` collection as a dict, so an event matched in
+    an earlier run skips candidate search and fuzzy scoring. Each link stores
+    the fixture signature (kickoff, competitors) it was made against. A link
+    whose fixture changed, or left the fixture index, is expired and the event
+    is matched again. Fuzzy links also keep their score and the margin over the
+    next best candidate, to review ambiguous matches. Links also store the
+    fixture kickoff: only links of fixtures in the fixture window are loaded, and
+    a TTL index removes links LINK_MAX_AGE after their fixture kicked off.
+    """
+
+    WRITE_BATCH_SIZE = 500
+    # Fixtures that kicked off this long ago have left the fixture window (FixtureIndex.LOOKBACK)
+    LINK_MAX_AGE = FixtureIndex.LOOKBACK
+
+    def __init__(self, collection, bookmaker, logger=None, window_start=None):
+        """
+        :param collection: MongoDB collection holding the links
+        :param bookmaker: str - bookmaker name (e.g., 'tipico')
+        :param logger: logger object
+        :param window_start: datetime - earliest fixture kickoff loaded, LINK_MAX_AGE ago if None
+        """
+        self.collection = collection
+        self.bookmaker = bookmaker
+        self.logger = logger
+        window_start = window_start or datetime.now(pytz.UTC) - self.LINK_MAX_AGE
+
+        self._links = {}
+        self._link_details = {}
+        self._changed_event_ids = set()
+        self._expired_event_ids = set()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.bulk_writer = BackgroundBulkWriter(collection, f'{bookmaker}_match_links', logger)
+
+        try:
+            self.collection.create_index([('bookmaker', 1), ('event_id', 1)], unique=True)
+            self.collection.create_index('kickoff', expireAfterSeconds=int(self.LINK_MAX_AGE.total_seconds()))
+            # Links stored before kickoffs were recorded would never expire
+            self.collection.delete_many({'bookmaker': self.bookmaker, 'kickoff': {'$exists': False}})
+            stored_links = self.collection.find(
+                {'bookmaker': self.bookmaker, 'kickoff': {'$gte': window_start}},
+                {'_id': 0, 'event_id': 1, 'match_id': 1, 'signature': 1}
+            )
+            for stored in stored_links:
+                self._links[stored['event_id']] = (stored['match_id'], stored.get('signature'))
+        except Exception as load_error:
+            if self.logger:
+                log_scraper_progress(
+                    self.logger, 'MATCH_LINK_LOAD_ERROR', 'Starting without match links', error=load_error
+                )
+
+        if self.logger:
+            log_scraper_progress(
+                self.logger, 'MATCH_LINKS_LOADED', f'Loaded {len(self._links)} {self.bookmaker} match links'
+            )
+
+    def lookup(self, event_id, fixture_index):
+        """
+        Fixture linked to a bookmaker event, if the link is still valid
+
+        :param event_id: str - bookmaker event id
+        :param fixture_index: FixtureIndex holding the current fixtures
+        :return: dict or None - fixture document
+        """
+        link = self._links.get(event_id)
+        if link is None:
+            self.misses += 1
+            return None
+
+        match_id, signature = link
+        fixture = fixture_index.fixture_by_match_id(match_id)
+        if fixture is None or fixture_signature(fixture) != signature:
+            del self._links[event_id]
+            self._link_details.pop(event_id, None)
+            self._changed_event_ids.discard(event_id)
+            self._expired_event_ids.add(event_id)
+            self.expired += 1
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return fixture
+
+    def link(self, event_id, fixture, score=None, margin=None):
+        """
+        Remember the fixture a bookmaker event was matched to
+
+        :param event_id: str - bookmaker event id
+        :param fixture: dict - matched fixture document
+        :param score: float - fuzzy score of the match, None for exact matches
+        :param margin: float - score margin over the next best candidate fixture
+        """
+        link = (fixture['match_id'], fixture_signature(fixture))
+        if self._links.get(event_id) == link:
+            return
+
+        self._links[event_id] = link
+        self._link_details[event_id] = (score, margin, normalize_timestamp_for_comparison(fixture['timestamp']))
+        self._expired_event_ids.discard(event_id)
+        self._changed_event_ids.add(event_id)
+        if len(self._changed_event_ids) >= self.WRITE_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        """Queue writes of new and changed links, and deletes of expired ones"""
+        operations = []
+        for event_id in self._changed_event_ids:
+            match_id, signature = self._links[event_id]
+            score, margin, kickoff = self._link_details.pop(event_id)
+            operations.append(UpdateOne(
+                {'bookmaker': self.bookmaker, 'event_id': event_id},
+                {'$set': {
+                    'match_id': match_id, 'signature': signature, 'score': score, 'margin': margin,
+                    'kickoff': kickoff, 'updatedAt': datetime.now(pytz.UTC),
+                }},
+                upsert=True
+            ))
+        for event_id in self._expired_event_ids:
+            operations.append(DeleteOne({'bookmaker': self.bookmaker, 'event_id': event_id}))
+
+        self._changed_event_ids = set()
+        self._expired_event_ids = set()
+        self.bulk_writer.submit(operations)
+
+    def close(self):
+        """Queue the last links and wait for them to be written"""
+        self.flush()
+        self.bulk_writer.close()
+
+
+class LeagueAlignmentCache:
+    """
+    Persistent bookmaker league -> Flashscore league alignment
+    A bookmaker league is aligned once per crawl to the Flashscore league of the
+    same sport and country whose normalized name scores highest, and the
+    alignment is stored in the `league_alignments` collection so later crawls
+    start with it. Leagues that don't align are retried in the next crawl only.
+    Event matching then runs on the candidate fixtures of the aligned league.
+    A league with the same normalized name always wins; otherwise a league whose
+    tokens only add to or drop from the bookmaker's ('premier league' and
+    'premier league 2') is never taken, the token-set and plain similarity must
+    both pass, and ties go to the closest plain similarity, then the name. A stored alignment is used only while it is
+    younger than ALIGNMENT_MAX_AGE, made under the current ALIGNMENT_VERSION and
+    its Flashscore league still has fixtures; otherwise the league is aligned again.
+    """
+
+    WRITE_BATCH_SIZE = 100
+    # Minimum token-set score between the bookmaker and Flashscore league names
+    LEAGUE_SCORE_THRESHOLD = 75.0
+    # Stored alignments are made again after this long, and removed by a TTL index
+    ALIGNMENT_MAX_AGE = timedelta(days=7)
+    # Bump when the alignment rules change, stored alignments of other versions are ignored
+    ALIGNMENT_VERSION = 2
+
+    def __init__(self, collection, bookmaker, fixture_index, logger=None):
+        """
+        :param collection: MongoDB collection holding the alignments
+        :param bookmaker: str - bookmaker name (e.g., 'tipico')
+        :param fixture_index: FixtureIndex holding the current fixtures
+        :param logger: logger object
+        """
+        self.collection = collection
+        self.bookmaker = bookmaker
+        self.fixture_index = fixture_index
+        self.logger = logger
+
+        self._alignments = {}
+        self._unaligned = set()
+        self._new_alignments = []
+        self.aligned_count = 0
+        self.unaligned_count = 0
+        self.bulk_writer = BackgroundBulkWriter(collection, f'{bookmaker}_league_alignments', logger)
+
+        try:
+            self.collection.create_index(
+                [('bookmaker', 1), ('sport_id', 1), ('country', 1), ('league', 1)], unique=True
+            )
+            self.collection.create_index(
+                'updatedAt', expireAfterSeconds=int(self.ALIGNMENT_MAX_AGE.total_seconds())
+            )
+            stored_alignments = self.collection.find(
+                {
+                    'bookmaker': self.bookmaker, 'version': self.ALIGNMENT_VERSION,
+                    'updatedAt': {'$gte': datetime.now(pytz.UTC) - self.ALIGNMENT_MAX_AGE}
+                },
+                {'_id': 0, 'sport_id': 1, 'country': 1, 'league': 1, 'flashscore_country': 1, 'flashscore_league': 1}
+            )
+            for stored in stored_alignments:
+                league_key = (stored['sport_id'], stored['country'], stored['league'])
+                self._alignments[league_key] = (stored['flashscore_country'], stored['flashscore_league'])
+        except Exception as load_error:
+            if self.logger:
+                log_scraper_progress(
+                    self.logger, 'LEAGUE_ALIGNMENT_LOAD_ERROR', 'Starting without league alignments', error=load_error
+                )
+
+        if self.logger:
+            log_scraper_progress(
+                self.logger, 'LEAGUE_ALIGNMENTS_LOADED',
+                f'Loaded {len(self._alignments)} {self.bookmaker} league alignments'
+            )
+
+    def align(self, sport_id, country_id, country_name, league_name):
+        """
+        Flashscore league aligned to a bookmaker league
+
+        :param sport_id: str - canonical sport id (see canonical_sport_id)
+        :param country_id: str - canonical country id or None
+        :param country_name: str - country name as given by the bookmaker
+        :param league_name: str - league name as given by the bookmaker
+        :return: tuple or None - (country key, normalized league name) as returned by FixtureIndex.league_of
+        """
+        league_key = (sport_id, league_country_key(country_id, country_name), normalize_league_name(league_name or ''))
+        if league_key in self._unaligned:
+            return None
+        alignment = self._alignments.get(league_key)
+        if alignment is not None:
+            if alignment[1] in self.fixture_index.leagues(sport_id, alignment[0]):
+                return alignment
+            # The aligned Flashscore league has no fixtures anymore
+            del self._alignments[league_key]
+
+        _, country_key, normalized_league = league_key
+        best_league = None
+        if normalized_league:
+            best_league = self._best_league(normalized_league, self.fixture_index.leagues(sport_id, country_key))
+        if best_league is None:
+            self._unaligned.add(league_key)
+            self.unaligned_count += 1
+            return None
+
+        alignment = (country_key, best_league)
+        self._alignments[league_key] = alignment
+        self._new_alignments.append((league_key, alignment))
+        self.aligned_count += 1
+        if len(self._new_alignments) >= self.WRITE_BATCH_SIZE:
+            self.flush()
+        return alignment
+
+    def _best_league(self, normalized_league, flashscore_leagues):
+        """
+        :param normalized_league: str - normalized bookmaker league name
+        :param flashscore_leagues: set - normalized Flashscore league names of the sport and country
+        :return: str or None - best scoring Flashscore league
+        """
+        if normalized_league in flashscore_leagues:
+            return normalized_league
+
+        league_tokens = set(normalized_league.split())
+        best_score = None
+        best_league = None
+        for flashscore_league in sorted(flashscore_leagues):
+            flashscore_tokens = set(flashscore_league.split())
+            if league_tokens <= flashscore_tokens or flashscore_tokens <= league_tokens:
+                # Subset names score 100 on token set without naming the same league
+                continue
+            # Short names share a token too easily ('serie a women', 'serie b'), both scores must pass
+            league_score = (
+                fuzz.token_set_ratio(normalized_league, flashscore_league, score_cutoff=self.LEAGUE_SCORE_THRESHOLD),
+                fuzz.ratio(normalized_league, flashscore_league, score_cutoff=self.LEAGUE_SCORE_THRESHOLD)
+            )
+            if not all(league_score):
+                continue
+            if best_score is None or league_score > best_score:
+                best_score = league_score
+                best_league = flashscore_league
+        return best_league
+
+    def flush(self):
+        """Queue writes of the alignments made since the last flush"""
+        operations = []
+        for (sport_id, country_key, league), (flashscore_country, flashscore_league) in self._new_alignments:
+            operations.append(UpdateOne(
+                {'bookmaker': self.bookmaker, 'sport_id': sport_id, 'country': country_key, 'league': league},
+                {'$set': {
+                    'flashscore_country': flashscore_country,
+                    'flashscore_league': flashscore_league,
+                    'version': self.ALIGNMENT_VERSION,
+                    'updatedAt': datetime.now(pytz.UTC),
+                }},
+                upsert=True
+            ))
+
+        self._new_alignments = []
+        self.bulk_writer.submit(operations)
+
+    def close(self):
+        """Queue the last alignments and wait for them to be written"""
+        self.flush()
+        self.bulk_writer.close()
+
+
+def _matchup_text(competitor1, competitor2):
+    matchup_tokens = competitor_name_form(competitor1).tokens | competitor_name_form(competitor2).tokens
+    return ' '.join(sorted(matchup_tokens))
+
+
+def name_cache_stats():
+    """
+    :return: dict - (hits, misses) of the competitor name cache, for the run stats
+    """
+    cache_info = competitor_name_form.cache_info()
+    return {'competitor_name': (cache_info.hits, cache_info.misses)}
+
+
+# Fixture assigned to a bookmaker event, with its score and the margin over the event's next best candidate
+FixtureAssignment = namedtuple('FixtureAssignment', ['fixture', 'score', 'margin'])
+
+# Assignment weight tie-breaks: token-set score, then the earlier candidate, both below any name similarity step
+_SET_SCORE_TIE_BREAK = 1e-4
+_CANDIDATE_RANK_TIE_BREAK = 1e-7
+
+
+def match_events_to_fixtures(event_competitors, candidate_fixtures, threshold=80.0):
+    """
+    Batch version of compare_matchups for a block of bookmaker events
+    Candidates pass on the combined token-set score, as in compare_matchups.
+    token_set_ratio gives 100 to every name that is a token subset of the other
+    ('Inter' and 'Inter W'), so events are assigned by the plain similarity of
+    the matchup texts instead, token-set score and candidate order breaking ties.
+    Only the pairs of an event and its own candidates are scored: events with
+    the same candidates (same sport and kickoff window) are grouped, and with
+    NumPy each group is scored in `process.cdist` calls on all cores.
+    Events are assigned one-to-one, two events never take the same fixture (see
+    assign_one_to_one). The margin is the assigned similarity minus the event's
+    next best candidate similarity, 0 when another candidate scores as well.
+
+    :param event_competitors: list - (competitor1, competitor2) of each bookmaker event
+    :param candidate_fixtures: list - list of candidate fixture documents for each event
+    :param threshold: float - minimum combined token-set score, as in compare_matchups
+    :return: list - FixtureAssignment or None, for each event
+    """
+    fixture_columns = {}
+    column_fixtures = []
+    # Distinct candidate columns of each event in candidate order -> event rows having exactly those candidates
+    rows_by_candidate_columns = {}
+    for event_row, fixtures in enumerate(candidate_fixtures):
+        candidate_columns = []
+        for fixture in fixtures:
+            if id(fixture) not in fixture_columns:
+                fixture_columns[id(fixture)] = len(column_fixtures)
+                column_fixtures.append(fixture)
+            if fixture_columns[id(fixture)] not in candidate_columns:
+                candidate_columns.append(fixture_columns[id(fixture)])
+        if candidate_columns:
+            rows_by_candidate_columns.setdefault(tuple(candidate_columns), []).append(event_row)
+
+    if not column_fixtures:
+        return [None] * len(event_competitors)
+
+    event_texts = [_matchup_text(competitor1, competitor2) for competitor1, competitor2 in event_competitors]
+    fixture_texts = [_matchup_text(fixture['competitor1'], fixture['competitor2']) for fixture in column_fixtures]
+
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+
+    # Per event row, fixture column -> (token-set score, similarity) of each candidate passing the threshold
+    candidate_scores = [{} for _ in event_competitors]
+    pair_weights = {}
+    for candidate_columns, event_rows in rows_by_candidate_columns.items():
+        if np is not None:
+            group_event_texts = [event_texts[event_row] for event_row in event_rows]
+            group_fixture_texts = [fixture_texts[fixture_column] for fixture_column in candidate_columns]
+            set_score_matrix = process.cdist(
+                group_event_texts, group_fixture_texts, scorer=fuzz.token_set_ratio, score_cutoff=threshold,
+                workers=-1
+            )
+            similarity_matrix = process.cdist(group_event_texts, group_fixture_texts, scorer=fuzz.ratio, workers=-1)
+        for group_row, event_row in enumerate(event_rows):
+            for candidate_rank, fixture_column in enumerate(candidate_columns):
+                if np is not None:
+                    set_score = float(set_score_matrix[group_row, candidate_rank])
+                    similarity = float(similarity_matrix[group_row, candidate_rank])
+                else:
+                    set_score = fuzz.token_set_ratio(
+                        event_texts[event_row], fixture_texts[fixture_column], score_cutoff=threshold
+                    )
+                    similarity = fuzz.ratio(event_texts[event_row], fixture_texts[fixture_column])
+                if set_score < threshold:
+                    continue
+                candidate_scores[event_row][fixture_column] = (set_score, similarity)
+                pair_weights[event_row, fixture_column] = (
+                    similarity + set_score * _SET_SCORE_TIE_BREAK - candidate_rank * _CANDIDATE_RANK_TIE_BREAK
+                )
+
+    assignments = [None] * len(event_competitors)
+    for event_row, fixture_column in assign_one_to_one(pair_weights, len(event_competitors), len(column_fixtures)):
+        set_score, similarity = candidate_scores[event_row][fixture_column]
+        next_best_similarity = max(
+            (other_similarity for other_column, (_, other_similarity) in candidate_scores[event_row].items()
+             if other_column != fixture_column),
+            default=0.0
+        )
+        margin = similarity - next_best_similarity
+        assignments[event_row] = FixtureAssignment(column_fixtures[fixture_column], set_score, margin)
+    return assignments
+
+
+def assign_one_to_one(pair_weights, event_count, fixture_count):
+    """
+    One-to-one assignment of events (rows) to fixtures (columns)
+    Maximizes the total weight with SciPy's linear_sum_assignment when installed,
+    otherwise assigns greedily by descending weight, the lower row and column
+    first on equal weights. Only the given pairs are ever assigned.
+
+    :param pair_weights: dict - (event row, fixture column) -> weight of each candidate pair
+    :param event_count: int - number of events
+    :param fixture_count: int - number of fixtures
+    :return: list - (event row, fixture column) of the assigned pairs, by event row
+    """
+    if not pair_weights:
+        return []
+
+    try:
+        import numpy as np
+        from scipy.optimize import linear_sum_assignment
+    except ImportError:
+        # Without SciPy the one-to-one assignment falls back to greedy-by-weight
+        linear_sum_assignment = None
+
+    if linear_sum_assignment is not None:
+        weights = np.zeros((event_count, fixture_count))
+        for (event_row, fixture_column), weight in pair_weights.items():
+            # Shifted so every candidate pair outweighs the zero of a non-candidate cell
+            weights[event_row, fixture_column] = weight + 1.0
+        event_rows, fixture_columns = linear_sum_assignment(weights, maximize=True)
+        assigned_pairs = zip(event_rows.tolist(), fixture_columns.tolist())
+        return [assigned_pair for assigned_pair in assigned_pairs if assigned_pair in pair_weights]
+
+    assigned_rows = set()
+    assigned_columns = set()
+    assigned_pairs = []
+    for (event_row, fixture_column), _ in sorted(pair_weights.items(), key=lambda item: (-item[1], item[0])):
+        if event_row in assigned_rows or fixture_column in assigned_columns:
+            continue
+        assigned_rows.add(event_row)
+        assigned_columns.add(fixture_column)
+        assigned_pairs.append((event_row, fixture_column))
+    return sorted(assigned_pairs)
+
+
+# Max kickoff difference (seconds) between a bookmaker and Flashscore for a candidate fixture
+KICKOFF_TOLERANCE_SECONDS_BY_BOOKMAKER = {
+    'tipico': 300,
+    'unibet': 300,
+    'bovada': 300,
+}
+
+
+class FixtureMatcher:
+    """
+    Matching of one bookmaker's events to Flashscore fixtures
+    Stages, cheapest first: the persistent event link, the exact join on
+    alias-resolved names, then batched fuzzy scoring of the fixtures kicking off
+    within the bookmaker's kickoff tolerance (narrowed to the aligned league), and
+    of the fixtures with the most similar names when kickoffs disagree or none of
+    the window matched. Used inside the prematch spiders and by the
+    reconciliation job; matched events are
+    collected and taken with pop_matched(). Each fixture is taken by at most one
+    event of the bookmaker per run: fixtures already matched are left out of
+    later fuzzy batches.
+    """
+
+    # Kickoff tolerance (seconds) of bookmakers missing from KICKOFF_TOLERANCE_SECONDS_BY_BOOKMAKER
+    KICKOFF_TOLERANCE_SECONDS = 300
+    # Bookmaker events scored against their candidate fixtures in one batch
+    MATCH_BATCH_SIZE = 50
+    # Without a fixture near the bookmaker kickoff, these many fixtures with the closest names are fuzzy scored
+    NAME_CANDIDATE_COUNT = 5
+    NAME_SEARCH_KICKOFF_WINDOW_SECONDS = 24 * 60 * 60
+    # Fuzzy matches winning by less than this over the next best candidate are counted as ambiguous
+    AMBIGUOUS_MARGIN = 5.0
+
+    def __init__(self, betting_database, bookmaker, logger=None, fixture_index=None, match_batch_size=None,
+                 kickoff_tolerance_seconds=None):
+        """
+        :param betting_database: MongoDB `betting` database
+        :param bookmaker: str - bookmaker name (e.g., 'tipico')
+        :param logger: logger object
+        :param fixture_index: FixtureIndex to share between matchers, loaded from `matches_data` if None
+        :param match_batch_size: int - events per fuzzy scoring batch, MATCH_BATCH_SIZE if None
+        :param kickoff_tolerance_seconds: int - max kickoff difference of a candidate fixture,
+            the bookmaker's KICKOFF_TOLERANCE_SECONDS_BY_BOOKMAKER entry if None
+        """
+        self.bookmaker = bookmaker
+        self.logger = logger
+        self.match_batch_size = match_batch_size or self.MATCH_BATCH_SIZE
+        if kickoff_tolerance_seconds is None:
+            kickoff_tolerance_seconds = KICKOFF_TOLERANCE_SECONDS_BY_BOOKMAKER.get(
+                bookmaker, self.KICKOFF_TOLERANCE_SECONDS
+            )
+        self.kickoff_tolerance_seconds = kickoff_tolerance_seconds
+
+        self.fixture_index = fixture_index or FixtureIndex(betting_database['matches_data'], logger)
+        self.competitor_aliases = CompetitorAliasIndex(betting_database['competitor_mapping'], logger)
+        self.match_links = MatchLinkCache(
+            betting_database['match_links'], bookmaker, logger, window_start=self.fixture_index.window_start
+        )
+        self.league_alignments = LeagueAlignmentCache(
+            betting_database['league_alignments'], bookmaker, self.fixture_index, logger
+        )
+
+        self._pending_events = []
+        self._matched_events = []
+        self._claimed_match_ids = set()
+        self.ambiguous_count = 0
+        self.tied_count = 0
+        self.name_search_count = 0
+
+    def add(self, event_id, match_information):
+        """
+        Match a bookmaker event by link or exact names, or queue it for batched fuzzy matching
+
+        :param event_id: str - bookmaker event id
+        :param match_information: dict - event with sport_id, timestamp, competitor1/2, country_id, country, group
+        """
+        # Event linked to a fixture in an earlier run, and the fixture hasn't changed since
+        linked_match = self.match_links.lookup(event_id, self.fixture_index)
+        if linked_match is not None:
+            self._claimed_match_ids.add(linked_match['match_id'])
+            self._matched_events.append((event_id, match_information, linked_match))
+            return
+
+        # Stage one: same sport, kickoff and normalized competitor names, known aliases resolved first
+        exact_match = self.fixture_index.exact_match(
+            match_information['sport_id'], match_information['timestamp'],
+            self.competitor_aliases.resolve(match_information['competitor1']),
+            self.competitor_aliases.resolve(match_information['competitor2'])
+        )
+        if exact_match is not None:
+            self._link(event_id, match_information, exact_match)
+            return
+
+        # Stage two: fixtures of the same sport kicking off within the tolerance, closest first
+        potential_matches = self.fixture_index.candidates(
+            match_information['sport_id'], match_information['timestamp'], self.kickoff_tolerance_seconds
+        )
+        aligned_league = self.league_alignments.align(
+            match_information['sport_id'], match_information['country_id'],
+            match_information['country'], match_information['group']
+        )
+        if aligned_league is not None:
+            # Only the aligned Flashscore league is scored, unless none of its fixtures kick off in the window
+            league_matches = [
+                fixture for fixture in potential_matches if self.fixture_index.league_of(fixture) == aligned_league
+            ]
+            potential_matches = league_matches or potential_matches
+        name_searched = not potential_matches
+        if name_searched:
+            # Stage three: kickoffs disagree, fixtures sharing the most name trigrams within a day
+            potential_matches = self._similar_fixtures(match_information)
+        if not potential_matches:
+            return
+
+        self._pending_events.append((event_id, match_information, potential_matches, name_searched))
+        if len(self._pending_events) >= self.match_batch_size:
+            self.match_pending()
+
+    def _similar_fixtures(self, match_information, excluded_fixtures=()):
+        excluded_match_ids = {fixture['match_id'] for fixture in excluded_fixtures}
+        similar_fixtures = self.fixture_index.similar_fixtures(
+            match_information['sport_id'], match_information['competitor1'], match_information['competitor2'],
+            self.NAME_CANDIDATE_COUNT + len(excluded_match_ids), match_information['timestamp'],
+            self.NAME_SEARCH_KICKOFF_WINDOW_SECONDS
+        )
+        return [fixture for fixture in similar_fixtures if fixture['match_id'] not in excluded_match_ids]
+
+    def match_pending(self):
+        """
+        Match queued events with their candidate fixtures in one batch
+        Events no fixture of their kickoff window matched are scored once more, in a
+        second batch, against the fixtures with the most similar names (stage three).
+        """
+        if not self._pending_events:
+            return
+
+        pending_events = self._pending_events
+        self._pending_events = []
+
+        assignments = match_events_to_fixtures(
+            [(match_information['competitor1'], match_information['competitor2'])
+             for _, match_information, _, _ in pending_events],
+            [
+                [fixture for fixture in potential_matches if fixture['match_id'] not in self._claimed_match_ids]
+                for _, _, potential_matches, _ in pending_events
+            ]
+        )
+
+        name_search_events = []
+        for (event_id, match_information, potential_matches, name_searched), assignment in zip(
+                pending_events, assignments):
+            if assignment is None:
+                if not name_searched:
+                    similar_fixtures = self._similar_fixtures(match_information, potential_matches)
+                    if similar_fixtures:
+                        name_search_events.append((event_id, match_information, similar_fixtures, True))
+                continue
+
+            flashscore_match = assignment.fixture
+            if assignment.margin < self.AMBIGUOUS_MARGIN:
+                self.ambiguous_count += 1
+            if assignment.margin <= 0:
+                # Another candidate scores as well: used for this run, but neither linked nor learned
+                self.tied_count += 1
+                self._claimed_match_ids.add(flashscore_match['match_id'])
+                self._matched_events.append((event_id, match_information, flashscore_match))
+                continue
+            self._link(event_id, match_information, flashscore_match, assignment.score, assignment.margin)
+            # Remember the names so later events resolve without fuzzy scoring
+            self.competitor_aliases.learn(match_information['competitor1'], flashscore_match['competitor1'])
+            self.competitor_aliases.learn(match_information['competitor2'], flashscore_match['competitor2'])
+
+        if name_search_events:
+            self.name_search_count += len(name_search_events)
+            self._pending_events.extend(name_search_events)
+            self.match_pending()
+
+    def _link(self, event_id, match_information, flashscore_match, score=None, margin=None):
+        self.match_links.link(event_id, flashscore_match, score, margin)
+        self._claimed_match_ids.add(flashscore_match['match_id'])
+        self._matched_events.append((event_id, match_information, flashscore_match))
+
+    def pop_matched(self):
+        """
+        :return: list - (event id, match information, fixture) of the events matched since the last call
+        """
+        matched_events = self._matched_events
+        self._matched_events = []
+        return matched_events
+
+    def flush(self):
+        """Match the queued events and queue writes of learned aliases, links and league alignments"""
+        self.match_pending()
+        self.competitor_aliases.flush()
+        self.match_links.flush()
+        self.league_alignments.flush()
+
+    def close(self):
+        """Match the queued events and wait for the aliases, links and league alignments to be written"""
+        self.match_pending()
+        self.competitor_aliases.close()
+        self.match_links.close()
+        self.league_alignments.close()
+
+    def log_stats(self):
+        if not self.logger:
+            return
+
+        log_scraper_progress(
+            self.logger, 'MATCH_LINK_STATS',
+            f'Match links - Hits: {self.match_links.hits}, Misses: {self.match_links.misses}, '
+            f'Expired: {self.match_links.expired}'
+        )
+        log_scraper_progress(
+            self.logger, 'MATCH_ASSIGNMENT_STATS',
+            f'Fixtures matched: {len(self._claimed_match_ids)}, '
+            f'Ambiguous (margin < {self.AMBIGUOUS_MARGIN:g}): {self.ambiguous_count}, '
+            f'Tied (not linked): {self.tied_count}, Name searches after an unmatched window: {self.name_search_count}'
+        )
+        log_scraper_progress(
+            self.logger, 'NAME_CACHE_STATS',
+            'Name caches - ' + ', '.join(
+                f'{cache_name}: {hits / ((hits + misses) or 1):.1%} hits of {hits + misses}'
+                for cache_name, (hits, misses) in name_cache_stats().items()
+            )
+        )
+        log_scraper_progress(
+            self.logger, 'LEAGUE_ALIGNMENT_STATS',
+            f'League alignments - Aligned: {self.league_alignments.aligned_count}, '
+            f'Unaligned: {self.league_alignments.unaligned_count}'
+        )
+
+
+def fixture_price_update(bookmaker, event_id, prices, fixture, price_hashes=None):
+    """
+    Bulk updates writing a bookmaker's prices to a matched Flashscore fixture
+    With price_hashes only the markets that changed since the last write are set
+    or unset, and an unchanged fixture gets no update at all.
+
+    :param bookmaker: str - bookmaker name (e.g., 'tipico')
+    :param event_id: str - bookmaker event id
+    :param prices: dict - bookmaker prices of the event
+    :param fixture: dict - matched fixture document
+    :param price_hashes: PriceHashCache of the bookmaker, None to always write the whole prices tree
+    :return: list - UpdateOne operations, empty if nothing changed
+    """
+    if price_hashes is None:
+        return [UpdateOne(
+            {"match_id": fixture["match_id"]},
+            {"$set": {f"prices.{bookmaker}": prices, f"{bookmaker}_match_id": event_id}}
+        )]
+    return price_hashes.diff_update(fixture["match_id"], event_id, prices)
+
+
+def price_hashes_reset(bookmaker):
+    """
+    `$set` fields for writers replacing a bookmaker's prices without hashing them (the live spiders)
+    The stored hash is dropped, so the next diff can't apply on the new tree, and
+    the write time keeps older full writes, replayed later, from overwriting it.
+
+    :param bookmaker: str - bookmaker name the prices are written under
+    :return: dict - update fields
+    """
+    return {f'price_hashes.{bookmaker}': {'writtenAt': datetime.now(pytz.UTC)}}
+
+
+def _price_digest(price_tree):
+    canonical_prices = json_util.dumps(price_tree, sort_keys=True)
+    return hashlib.blake2b(canonical_prices.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def _is_update_path_key(key):
+    return isinstance(key, str) and bool(key) and '.' not in key and not key.startswith('$')
+
+
+class PriceHashCache:
+    """
+    Content hashes of the prices last written per (match_id, bookmaker)
+    Stored alongside the prices as `price_hashes.<bookmaker>`: one digest of the
+    whole tree, one per market (`<header>.<market>`) and the write time, loaded
+    once per run for the fixture window. An unchanged tree is skipped; otherwise
+    only the changed markets are `$set` and the removed ones `$unset` with
+    dotted paths, filtered on the stored hash the diff was made against. It is
+    followed by a whole-tree write filtered on a different hash and an older
+    write time, which only applies when the diff didn't (the document changed
+    since it was loaded, or the diff is replayed from a spill file late), so the
+    stored hash always describes the stored tree. Hashes are only ever recorded
+    by the write itself, never in memory ahead of it. Keys that can't be used in
+    an update path ('.', '$') fall back to the whole-tree write alone.
+    """
+
+    def __init__(self, matches_collection, bookmaker, logger=None, window_start=None):
+        """
+        :param matches_collection: MongoDB `matches_data` collection
+        :param bookmaker: str - bookmaker name (e.g., 'tipico')
+        :param logger: logger object
+        :param window_start: datetime - earliest kickoff loaded, FixtureIndex.LOOKBACK ago if None
+        """
+        self.bookmaker = bookmaker
+        self.logger = logger
+        self._hashes_by_match_id = {}
+        self.skipped_count = 0
+        self.diffed_count = 0
+        self.full_count = 0
+
+        window_start = window_start or datetime.now(pytz.UTC) - FixtureIndex.LOOKBACK
+        hash_field = f'price_hashes.{bookmaker}'
+        try:
+            stored_hashes = matches_collection.find(
+                {'timestamp': {'$gte': window_start}, hash_field: {'$exists': True}},
+                {'_id': 0, 'match_id': 1, hash_field: 1, f'{bookmaker}_match_id': 1}
+            )
+            for stored in stored_hashes:
+                self._hashes_by_match_id[stored['match_id']] = (
+                    stored['price_hashes'][bookmaker], stored.get(f'{bookmaker}_match_id')
+                )
+        except Exception as load_error:
+            if self.logger:
+                log_scraper_progress(
+                    self.logger, 'PRICE_HASH_LOAD_ERROR', 'Writing whole price trees this run', error=load_error
+                )
+
+        if self.logger:
+            log_scraper_progress(
+                self.logger, 'PRICE_HASHES_LOADED',
+                f'Loaded {len(self._hashes_by_match_id)} {self.bookmaker} price hashes'
+            )
+
+    @staticmethod
+    def price_hashes(prices):
+        """
+        :param prices: dict - bookmaker prices, {header: {market: ...}}
+        :return: dict - {'hash': digest of the tree, 'markets': {header: {market: digest}}}
+        """
+        market_hashes = {
+            header: {market: _price_digest(market_prices) for market, market_prices in header_prices.items()}
+            if isinstance(header_prices, dict) else _price_digest(header_prices)
+            for header, header_prices in prices.items()
+        }
+        return {'hash': _price_digest(prices), 'markets': market_hashes}
+
+    def diff_update(self, match_id, event_id, prices):
+        """
+        :param match_id: str - Flashscore match id
+        :param event_id: str - bookmaker event id
+        :param prices: dict - bookmaker prices of the event, None when it has no usable markets
+        :return: list - UpdateOne operations, empty if the prices and event id are unchanged
+        """
+        # remove_empty_dicts gives None for an event without markets, its stored markets are all removed
+        prices = prices or {}
+        new_hashes = self.price_hashes(prices)
+        previous_hashes, previous_event_id = self._hashes_by_match_id.get(match_id, (None, None))
+        previous_hash = previous_hashes.get('hash') if previous_hashes is not None else None
+
+        if previous_hash is not None and previous_hash == new_hashes['hash'] and previous_event_id == event_id:
+            self.skipped_count += 1
+            return []
+
+        written_at = datetime.now(pytz.UTC)
+        new_hashes['writtenAt'] = written_at
+        hash_field = f'price_hashes.{self.bookmaker}'
+        prices_field = f'prices.{self.bookmaker}'
+        # Whole tree, unless the stored tree already has this hash or was written later
+        full_update = UpdateOne(
+            {
+                "match_id": match_id,
+                f'{hash_field}.hash': {'$ne': new_hashes['hash']},
+                '$or': [
+                    {f'{hash_field}.writtenAt': {'$exists': False}},
+                    {f'{hash_field}.writtenAt': {'$lt': written_at}},
+                ],
+            },
+            {"$set": {prices_field: prices, hash_field: new_hashes, f'{self.bookmaker}_match_id': event_id}}
+        )
+
+        previous_markets = previous_hashes.get('markets') if previous_hashes is not None else None
+        if previous_hash is None or not isinstance(previous_markets, dict) \
+                or not self._has_path_keys(prices, previous_markets):
+            self.full_count += 1
+            return [full_update]
+
+        update_set = {hash_field: new_hashes, f'{self.bookmaker}_match_id': event_id}
+        update_unset = {}
+        for header, header_prices in prices.items():
+            header_hashes = new_hashes['markets'][header]
+            previous_header_hashes = previous_markets.get(header)
+            if not isinstance(header_hashes, dict) or not isinstance(previous_header_hashes, dict):
+                if header_hashes != previous_header_hashes:
+                    update_set[f'{prices_field}.{header}'] = header_prices
+                continue
+            for market, market_hash in header_hashes.items():
+                if previous_header_hashes.get(market) != market_hash:
+                    update_set[f'{prices_field}.{header}.{market}'] = header_prices[market]
+            for market in previous_header_hashes:
+                if market not in header_hashes:
+                    update_unset[f'{prices_field}.{header}.{market}'] = ''
+        for header in previous_markets:
+            if header not in prices:
+                update_unset[f'{prices_field}.{header}'] = ''
+
+        self.diffed_count += 1
+        update_document = {"$set": update_set}
+        if update_unset:
+            update_document["$unset"] = update_unset
+        # Only applies on the exact tree the diff was made against
+        diff_update = UpdateOne(
+            {
+                "match_id": match_id,
+                f'{hash_field}.hash': previous_hash,
+                f'{hash_field}.writtenAt': {'$lt': written_at},
+            },
+            update_document
+        )
+        return [diff_update, full_update]
+
+    @staticmethod
+    def _has_path_keys(prices, previous_markets):
+        for price_tree in (prices, previous_markets):
+            for header, header_tree in price_tree.items():
+                if not _is_update_path_key(header):
+                    return False
+                if isinstance(header_tree, dict) and not all(_is_update_path_key(market) for market in header_tree):
+                    return False
+        return True
+
+    def log_stats(self):
+        if self.logger:
+            log_scraper_progress(
+                self.logger, 'PRICE_DIFF_STATS',
+                f'{self.bookmaker} price writes - Unchanged (skipped): {self.skipped_count}, '
+                f'Changed markets only: {self.diffed_count}, Whole tree: {self.full_count}'
+            )
+
+
+STAGED_EVENTS_COLLECTION = 'staged_events'
+STAGED_EVENT_FIELDS = ['sport', 'sport_id', 'country', 'country_id', 'group', 'timestamp', 'competitor1', 'competitor2']
+# Staged events are removed by a TTL index this long after they were staged
+STAGED_EVENT_MAX_AGE = timedelta(days=1)
+
+
+def get_staged_events_collection(betting_database):
+    """
+    :param betting_database: MongoDB `betting` database
+    :return: collection of the bookmaker events waiting for reconcile.py, keyed by (bookmaker, event_id)
+    """
+    staged_events_collection = betting_database[STAGED_EVENTS_COLLECTION]
+    staged_events_collection.create_index([('bookmaker', 1), ('event_id', 1)], unique=True)
+    staged_events_collection.create_index([('bookmaker', 1), ('crawlStartedAt', -1)])
+    staged_events_collection.create_index(
+        'stagedAt', expireAfterSeconds=int(STAGED_EVENT_MAX_AGE.total_seconds())
+    )
+    return staged_events_collection
+
+
+def staged_event_update(bookmaker, event_id, match_information, prices, crawl_started_at):
+    """
+    Bulk upsert of a normalized bookmaker event into the staging collection
+
+    :param bookmaker: str - bookmaker name (e.g., 'tipico')
+    :param event_id: str - bookmaker event id
+    :param match_information: dict - normalized event (see STAGED_EVENT_FIELDS)
+    :param prices: dict - bookmaker prices of the event
+    :param crawl_started_at: datetime - start of the staging crawl, reconcile.py reads the latest crawl only
+    :return: UpdateOne
+    """
+    staged_event = {field: match_information[field] for field in STAGED_EVENT_FIELDS}
+    staged_event['prices'] = prices
+    staged_event['crawlStartedAt'] = crawl_started_at
+    staged_event['stagedAt'] = datetime.now(pytz.UTC)
+    return UpdateOne({'bookmaker': bookmaker, 'event_id': event_id}, {'$set': staged_event}, upsert=True)
+
+
 def remove_empty_dicts(obj):
     """
     Recursively removes:
@@ -0,0 +1,111 @@
+import sys
+from datetime import datetime
+import pytz
+from helper import (
+    setup_scraper_logger, log_scraper_progress, execute_bulk_write_operations,
+    FixtureIndex, FixtureMatcher, PriceHashCache, fixture_price_update, STAGED_EVENTS_COLLECTION, get_database,
+    KICKOFF_TOLERANCE_SECONDS_BY_BOOKMAKER
+)
+
+# Bookmakers whose prematch spiders can stage events (`scrapy crawl ... -a staged=1`)
+STAGED_BOOKMAKERS = ['tipico', 'unibet', 'bovada']
+# Staged events are scored against their candidate fixtures in batches of this size
+RECONCILE_MATCH_BATCH_SIZE = 2000
+
+
+def reconcile_bookmaker(betting_database, bookmaker, fixture_index, logger):
+    """
+    Match the staged events of one bookmaker to Flashscore fixtures and write their prices in one bulk write
+
+    :param betting_database: MongoDB `betting` database
+    :param bookmaker: str - bookmaker name (e.g., 'tipico')
+    :param fixture_index: FixtureIndex shared by all bookmakers
+    :param logger: logger object
+    :return: int - number of matched events
+    """
+    # Only the latest staging crawl, and only events yet to kick off: prices of started events belong to the
+    # live spiders, and an event missing from the latest crawl was taken off by the bookmaker
+    staged_events_collection = betting_database[STAGED_EVENTS_COLLECTION]
+    latest_staged_event = staged_events_collection.find_one(
+        {'bookmaker': bookmaker}, {'_id': 0, 'crawlStartedAt': 1}, sort=[('crawlStartedAt', -1)]
+    )
+    if latest_staged_event is None or latest_staged_event.get('crawlStartedAt') is None:
+        log_scraper_progress(logger, 'BOOKMAKER_RECONCILED', f'{bookmaker}: no staged events')
+        return 0
+
+    fixture_matcher = FixtureMatcher(
+        betting_database, bookmaker, logger, fixture_index=fixture_index,
+        match_batch_size=RECONCILE_MATCH_BATCH_SIZE,
+        kickoff_tolerance_seconds=KICKOFF_TOLERANCE_SECONDS_BY_BOOKMAKER.get(bookmaker)
+    )
+    staged_events = staged_events_collection.find(
+        {
+            'bookmaker': bookmaker, 'crawlStartedAt': latest_staged_event['crawlStartedAt'],
+            'timestamp': {'$gte': datetime.now(pytz.UTC)}
+        },
+        {'_id': 0, 'stagedAt': 0, 'crawlStartedAt': 0}
+    )
+    staged_count = 0
+    for staged_event in staged_events:
+        fixture_matcher.add(staged_event['event_id'], staged_event)
+        staged_count += 1
+    fixture_matcher.close()
+
+    price_hashes = PriceHashCache(
+        betting_database['matches_data'], bookmaker, logger, window_start=fixture_index.window_start
+    )
+    matched_count = 0
+    update_operations = []
+    for event_id, staged_event, flashscore_match in fixture_matcher.pop_matched():
+        matched_count += 1
+        update_operations.extend(
+            fixture_price_update(bookmaker, event_id, staged_event['prices'], flashscore_match, price_hashes)
+        )
+    if update_operations:
+        execute_bulk_write_operations(
+            betting_database['matches_data'], update_operations, f"{bookmaker}_reconcile", logger
+        )
+
+    log_scraper_progress(
+        logger, 'BOOKMAKER_RECONCILED',
+        f'{bookmaker}: {matched_count} of {staged_count} staged events matched',
+        match_count=matched_count
+    )
+    fixture_matcher.log_stats()
+    price_hashes.log_stats()
+    return matched_count
+
+
+def reconcile(bookmakers=None):
+    """
+    Reconcile the staged events of the given bookmakers, all staged bookmakers if None
+
+    :param bookmakers: list - bookmaker names
+    """
+    logger = setup_scraper_logger('reconcile')
+    started_at = datetime.now(pytz.UTC)
+    log_scraper_progress(logger, 'INIT', 'Initializing staged events reconciliation')
+
+    betting_database = get_database()
+
+    # Fixtures are loaded once for every bookmaker
+    fixture_index = FixtureIndex(betting_database['matches_data'], logger)
+
+    matched_count = 0
+    for bookmaker in bookmakers or STAGED_BOOKMAKERS:
+        try:
+            matched_count += reconcile_bookmaker(betting_database, bookmaker, fixture_index, logger)
+        except Exception as reconcile_error:
+            log_scraper_progress(
+                logger, 'RECONCILE_ERROR', f'Error reconciling {bookmaker} staged events', error=reconcile_error
+            )
+
+    log_scraper_progress(
+        logger, 'RECONCILE_COMPLETED',
+        f'Reconciled in {(datetime.now(pytz.UTC) - started_at).total_seconds():.1f}s',
+        match_count=matched_count
+    )
+
+
+if __name__ == '__main__':
+    reconcile(sys.argv[1:])
@@ -0,0 +1,120 @@
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+
+import helper
+from helper import assign_one_to_one, match_events_to_fixtures
+
+KICKOFF = datetime.now(pytz.UTC).replace(microsecond=0) + timedelta(days=1)
+
+
+def make_fixture(match_id, competitor1, competitor2, kickoff=KICKOFF):
+    return {'match_id': match_id, 'sport': 'Soccer', 'competitor1': competitor1, 'competitor2': competitor2,
+            'timestamp': kickoff}
+
+
+@pytest.fixture(params=['scipy', 'greedy'])
+def assignment_path(request, monkeypatch):
+    """Runs a test with SciPy's linear_sum_assignment and with the greedy fallback"""
+    if request.param == 'greedy':
+        monkeypatch.setitem(sys.modules, 'scipy.optimize', None)
+    return request.param
+
+
+@pytest.fixture(params=['numpy', 'no numpy'])
+def scoring_path(request, monkeypatch):
+    """Runs a test with the cdist scoring and with the per pair fallback"""
+    if request.param == 'no numpy':
+        monkeypatch.setitem(sys.modules, 'numpy', None)
+    return request.param
+
+
+def test_assign_one_to_one_without_pairs(assignment_path):
+    assert assign_one_to_one({}, 3, 3) == []
+
+
+def test_assign_one_to_one_only_assigns_candidate_pairs(assignment_path):
+    assert assign_one_to_one({(1, 0): 85.0}, 2, 2) == [(1, 0)]
+
+
+def test_assign_one_to_one_never_shares_a_fixture(assignment_path):
+    pair_weights = {(0, 0): 95.0, (1, 0): 90.0, (1, 1): 88.0}
+    assert assign_one_to_one(pair_weights, 2, 2) == [(0, 0), (1, 1)]
+
+
+def test_assign_one_to_one_greedy_breaks_equal_weights_by_row_and_column(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'scipy.optimize', None)
+    pair_weights = {(1, 1): 90.0, (0, 1): 90.0, (1, 0): 90.0, (0, 0): 90.0}
+    assert assign_one_to_one(pair_weights, 2, 2) == [(0, 0), (1, 1)]
+    assert assign_one_to_one({(0, 1): 90.0, (0, 0): 90.0}, 1, 2) == [(0, 0)]
+
+
+def test_assign_one_to_one_scipy_maximizes_the_total_on_equal_weights():
+    pytest.importorskip('scipy.optimize')
+    # Greedy takes (0, 0) and leaves event 1 without a fixture, the optimal assignment matches both events
+    pair_weights = {(0, 0): 90.0, (0, 1): 90.0, (1, 0): 90.0}
+    assert assign_one_to_one(pair_weights, 2, 2) == [(0, 1), (1, 0)]
+
+
+def test_match_events_to_fixtures_prefers_the_plain_name_over_a_token_subset(scoring_path, assignment_path):
+    women = make_fixture('women', 'Juventus W', 'Inter W')
+    men = make_fixture('men', 'Juventus', 'Inter')
+
+    assignment, = match_events_to_fixtures([('Juventus', 'Inter')], [[women, men]])
+
+    assert assignment.fixture is men
+    assert assignment.score == 100.0
+    assert assignment.margin > 0
+
+
+def test_match_events_to_fixtures_ties_go_to_the_earlier_candidate_with_no_margin(scoring_path, assignment_path):
+    first = make_fixture('first', 'Juventus', 'Inter')
+    second = make_fixture('second', 'Juventus', 'Inter', kickoff=KICKOFF + timedelta(minutes=3))
+
+    assignment, = match_events_to_fixtures([('Juventus', 'Inter')], [[first, second]])
+
+    assert assignment.fixture is first
+    assert assignment.margin == 0
+
+
+def test_match_events_to_fixtures_assigns_each_fixture_once(scoring_path, assignment_path):
+    juventus_inter = make_fixture('juventus-inter', 'Juventus', 'Inter')
+    milan_roma = make_fixture('milan-roma', 'AC Milan', 'AS Roma')
+    candidates = [juventus_inter, milan_roma]
+
+    assignments = match_events_to_fixtures(
+        [('Juventus', 'Inter'), ('Juventus Turin', 'Inter'), ('Napoli', 'Lazio')], [candidates] * 3
+    )
+
+    assert assignments[0].fixture is juventus_inter
+    assert assignments[1] is None
+    assert assignments[2] is None
+
+
+def test_match_events_to_fixtures_scores_only_the_candidates_of_each_event(monkeypatch):
+    pytest.importorskip('numpy')
+    scored_shapes = []
+    cdist = helper.process.cdist
+
+    def recording_cdist(queries, choices, **kwargs):
+        scored_shapes.append((len(queries), len(choices)))
+        return cdist(queries, choices, **kwargs)
+
+    monkeypatch.setattr(helper.process, 'cdist', recording_cdist)
+    early_fixtures = [
+        make_fixture('juventus-inter', 'Juventus', 'Inter'), make_fixture('milan-roma', 'AC Milan', 'AS Roma')
+    ]
+    late_fixture = make_fixture('napoli-lazio', 'Napoli', 'Lazio', kickoff=KICKOFF + timedelta(hours=2))
+
+    assignments = match_events_to_fixtures(
+        [('Juventus', 'Inter'), ('AC Milan', 'AS Roma'), ('Napoli', 'Lazio')],
+        [early_fixtures, early_fixtures, [late_fixture]]
+    )
+
+    assert [assignment.fixture['match_id'] for assignment in assignments] == [
+        'juventus-inter', 'milan-roma', 'napoli-lazio'
+    ]
+    # One token-set and one similarity matrix per group of events sharing candidates, never events x all fixtures
+    assert sorted(scored_shapes) == [(1, 1), (1, 1), (2, 2), (2, 2)]
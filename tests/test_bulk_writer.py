@@ -0,0 +1,59 @@
+import pytest
+from pymongo import UpdateOne
+from pymongo.errors import AutoReconnect
+
+from helper import BackgroundBulkWriter
+
+
+class FakeCollection:
+    """Collection whose bulk writes fail on the connection while `offline` is set"""
+
+    def __init__(self, name, offline=False):
+        self.name = name
+        self.offline = offline
+        self.written_operations = []
+
+    def bulk_write(self, operations, ordered=True):
+        if self.offline:
+            raise AutoReconnect('connection closed')
+        self.written_operations.extend(operations)
+
+
+@pytest.fixture(autouse=True)
+def spill_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(BackgroundBulkWriter, 'SPILL_DIRECTORY', str(tmp_path))
+    monkeypatch.setattr(BackgroundBulkWriter, 'RETRY_BACKOFF_SECONDS', 0)
+    return tmp_path
+
+
+def spill(collection, operations):
+    bulk_writer = BackgroundBulkWriter(collection, 'tipico_updates')
+    bulk_writer.submit(operations)
+    bulk_writer.close()
+    assert bulk_writer.spilled_count == len(operations)
+
+
+def test_spilled_writes_are_replayed_into_the_same_collection_only():
+    staged_events = FakeCollection('staged_events', offline=True)
+    staged_event = UpdateOne({'bookmaker': 'tipico', 'event_id': 'e1'}, {'$set': {'prices': {}}}, upsert=True)
+    spill(staged_events, [staged_event])
+
+    matches_data = FakeCollection('matches_data')
+    matches_writer = BackgroundBulkWriter(matches_data, 'tipico_updates')
+    matches_writer.close()
+    assert matches_writer.replayed_count == 0
+    assert matches_data.written_operations == []
+
+    staged_events.offline = False
+    staged_writer = BackgroundBulkWriter(staged_events, 'tipico_updates')
+    staged_writer.close()
+    assert staged_writer.replayed_count == 1
+    assert staged_events.written_operations == [staged_event]
+
+
+def test_spill_and_quarantine_files_are_named_by_collection_and_operation_type(spill_directory):
+    bulk_writer = BackgroundBulkWriter(FakeCollection('staged_events'), 'tipico_updates')
+    bulk_writer.close()
+
+    assert bulk_writer.spill_file == str(spill_directory / 'staged_events_tipico_updates_failed_writes.jsonl')
+    assert bulk_writer.quarantine_file == str(spill_directory / 'staged_events_tipico_updates_rejected_writes.jsonl')
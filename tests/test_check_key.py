@@ -0,0 +1,98 @@
+import itertools
+import json
+import os
+
+import pytest
+
+from helper import check_key
+
+OTS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'json_files', 'ots.json')
+
+
+def baseline_check_key(name):
+    """check_key before the exclusions were compiled into one regex, the reference the decisions must match"""
+    not_used_key = ['scoreless','end','go', 'never', 'niether', 'total runs', 'to score', 'get', 'including overtime', 'own', 'retain',
+                    ':', '0:', 'award', 'kick',
+                    'penalty', 'target', 'shots', 'series', 'yellow', 'super over',
+                    'header', '4s', 'touchdown', 'of the match', 'hero', 'tries', 'more', '6s', 'fifty', 'scored',
+                    'century', 'last', "player's total runs", 'given', 'red', 'retain', 'most', 'odd/even',
+                    'performance', 'converted', 'listed', 'center', 'margin', 'try', 'either', 'hc ', 'runs ',
+                    'rushing', 'out', 'yards', 'receving', 'both', 'and', 'remaining', '(', ')', 'tie', 'break',
+                    'deuce', 'next', 'touchdowns', 'range', 'will', '?', 'did', 'does', 'hour', 'minute', 'halves',
+                    'scorer',
+                    'betting', '&', '1 .ht', '1. ht', '1.ht', 'number of runs in match', 'how', 'which', 'who',
+                    'result', 'win', 'halftime', 'legs', 'half time', 'full time',
+                    'tackles', 'attempts', 'final', 'frame', 'side', 'wides', 'highest', 'four',
+                    'sixes', 'assists', 'made', 'home', 'away', 'rebounds', 'milestones', 'qualify', 'exact',
+                    'bottom', 'top', 'wicket', 'at least', 'at end', 'at the end', 'before', 'after', 'fulltime',
+                    'lead', 'race', 'stats', 'specials', 'squares', 'puck', 'record']
+
+    if not any(word in name.lower() for word in not_used_key):
+        if '2-way & over/under' in name.lower():
+            return False
+        if 'half' in name.lower():
+            if 'point spread' in name.lower() and 'o/u' in name.lower():
+                return False
+            if 'winner' in name.lower():
+                return False
+            return True
+        elif 'first' not in name.lower():
+            if 'point spread' in name.lower() and 'o/u' in name.lower():
+                return False
+            if 'winner' in name.lower():
+                return False
+            return True
+    return False
+
+
+def ots_labels():
+    with open(OTS_FILE) as ots_file:
+        odds_types = json.load(ots_file)
+    labels = set()
+    for odds_type in odds_types:
+        labels.add(odds_type['id'])
+        labels.update(odds_type.get('maps', []))
+        for outcome_value in odds_type.get('ovs', []):
+            labels.update(outcome_value.get('maps', []))
+    return sorted(labels)
+
+
+EDGE_CASE_LABELS = [
+    '', 'half', 'HALF', 'first', 'First', 'winner', 'Winner', 'first half', 'First Half', '1st half', 'half first',
+    'half winner', 'first winner', 'first half winner', 'match winner', 'point spread', 'point spread o/u',
+    'Point Spread - 1st Half O/U', 'point spread first o/u', '2-way & over/under', '2-Way & Over/Under - first half',
+    'moneyline', 'moneyline - first half', 'moneyline - first', 'total - 2nd half', 'handicap first', 'spread',
+    'o/u', 'winner (2-way)', 'halfwinner', 'firsthalf', 'Total Goals - first', 'first to', 'first-half',
+]
+COMBINATION_WORDS = ['half', 'first', 'winner', 'point spread', 'o/u', '2-way & over/under', 'total', 'moneyline']
+
+
+def combination_labels():
+    for word_count in range(1, 4):
+        for words in itertools.permutations(COMBINATION_WORDS, word_count):
+            yield ' '.join(words)
+            yield ' - '.join(words).title()
+
+
+@pytest.mark.parametrize('label', ots_labels())
+def test_check_key_matches_the_baseline_on_ots_ids_and_aliases(label):
+    assert check_key(label) == baseline_check_key(label)
+
+
+@pytest.mark.parametrize('label', EDGE_CASE_LABELS)
+def test_check_key_matches_the_baseline_on_edge_cases(label):
+    assert check_key(label) == baseline_check_key(label)
+
+
+def test_check_key_matches_the_baseline_on_half_first_winner_combinations():
+    mismatches = [label for label in combination_labels() if check_key(label) != baseline_check_key(label)]
+    assert mismatches == []
+
+
+def test_check_key_decisions():
+    assert check_key('Point Spread')
+    assert check_key('Total - 1st Half')
+    assert not check_key('Moneyline - First 5 Innings')
+    assert not check_key('Half Winner')
+    assert not check_key('Point Spread O/U')
+    assert not check_key('Both Teams To Score')
@@ -0,0 +1,121 @@
+from datetime import datetime, timedelta
+
+import pytz
+
+import helper
+from helper import FixtureIndex, FixtureMatcher, canonical_sport_id
+
+KICKOFF = datetime.now(pytz.UTC).replace(microsecond=0) + timedelta(days=1)
+SOCCER = canonical_sport_id('Soccer')
+
+
+class FakeMatchesCollection:
+    """matches_data stand-in, find() honours the `_id` lower bound FixtureIndex.refresh() queries with"""
+
+    def __init__(self, fixtures):
+        self.fixtures = list(fixtures)
+
+    def find(self, query, projection=None):
+        lower_bound = query.get('_id', {}).get('$gt')
+        return [fixture for fixture in self.fixtures if lower_bound is None or fixture['_id'] > lower_bound]
+
+
+class FakeCollection:
+    """Empty collection for the caches a FixtureMatcher loads"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def find(self, *args, **kwargs):
+        return []
+
+    def create_index(self, *args, **kwargs):
+        pass
+
+    def delete_many(self, *args, **kwargs):
+        pass
+
+    def bulk_write(self, operations, ordered=True):
+        pass
+
+
+class FakeDatabase(dict):
+    def __missing__(self, collection_name):
+        return self.setdefault(collection_name, FakeCollection(collection_name))
+
+
+def make_fixture(fixture_id, match_id, competitor1, competitor2, kickoff=KICKOFF, group='Serie A'):
+    return {
+        '_id': fixture_id, 'match_id': match_id, 'sport': 'Soccer', 'country': 'Italy', 'country_id': 98,
+        'group': group, 'competitor1': competitor1, 'competitor2': competitor2, 'timestamp': kickoff
+    }
+
+
+def test_fixture_index_exact_match_uses_normalized_names():
+    fixture = make_fixture(1, 'a', 'Juventus', 'Inter')
+    fixture_index = FixtureIndex(FakeMatchesCollection([fixture]))
+
+    assert fixture_index.exact_match(SOCCER, KICKOFF, 'JUVENTUS', ' inter ') is fixture
+    assert fixture_index.exact_match(SOCCER, KICKOFF + timedelta(minutes=1), 'Juventus', 'Inter') is None
+    assert fixture_index.exact_match(canonical_sport_id('Basketball'), KICKOFF, 'Juventus', 'Inter') is None
+
+
+def test_fixture_index_keeps_the_document_inserted_last_whatever_the_load_order():
+    newer = make_fixture(2, 'a', 'Juventus', 'Inter', kickoff=KICKOFF + timedelta(hours=2))
+    older = make_fixture(1, 'a', 'Juventus', 'Inter')
+    fixture_index = FixtureIndex(FakeMatchesCollection([newer, older]))
+
+    assert fixture_index.fixture_by_match_id('a') is newer
+    assert fixture_index.similar_fixtures(SOCCER, 'Juventus', 'Inter') == [newer]
+
+
+def test_fixture_index_refresh_adds_only_new_documents():
+    matches_collection = FakeMatchesCollection([make_fixture(1, 'a', 'Juventus', 'Inter')])
+    fixture_index = FixtureIndex(matches_collection)
+    added = make_fixture(2, 'b', 'AC Milan', 'AS Roma')
+    matches_collection.fixtures.append(added)
+
+    assert fixture_index.refresh(force=True) == 1
+    assert fixture_index.fixture_count == 2
+    assert fixture_index.exact_match(SOCCER, KICKOFF, 'AC Milan', 'AS Roma') is added
+    assert fixture_index.refresh(force=True) == 0
+
+
+def test_fixture_index_candidates_closest_kickoff_first():
+    on_time = make_fixture(1, 'on-time', 'Juventus', 'Inter')
+    later = make_fixture(2, 'later', 'AC Milan', 'AS Roma', kickoff=KICKOFF + timedelta(minutes=4))
+    earlier = make_fixture(3, 'earlier', 'Napoli', 'Lazio', kickoff=KICKOFF - timedelta(minutes=2))
+    outside = make_fixture(4, 'outside', 'Torino', 'Genoa', kickoff=KICKOFF + timedelta(minutes=10))
+    fixture_index = FixtureIndex(FakeMatchesCollection([on_time, later, earlier, outside]))
+
+    assert fixture_index.candidates(SOCCER, KICKOFF, tolerance_seconds=300) == [on_time, earlier, later]
+    assert fixture_index.candidates(SOCCER, KICKOFF) == [on_time]
+
+
+def test_fixture_matcher_kickoff_tolerance_per_bookmaker(monkeypatch):
+    monkeypatch.setitem(helper.KICKOFF_TOLERANCE_SECONDS_BY_BOOKMAKER, 'tipico', 600)
+    fixture_index = FixtureIndex(FakeMatchesCollection([]))
+    fixture_matchers = [
+        FixtureMatcher(FakeDatabase(), 'tipico', fixture_index=fixture_index),
+        FixtureMatcher(FakeDatabase(), 'tipico', fixture_index=fixture_index, kickoff_tolerance_seconds=120),
+        FixtureMatcher(FakeDatabase(), 'other', fixture_index=fixture_index),
+    ]
+    for fixture_matcher in fixture_matchers:
+        fixture_matcher.close()
+
+    assert [fixture_matcher.kickoff_tolerance_seconds for fixture_matcher in fixture_matchers] == [
+        600, 120, FixtureMatcher.KICKOFF_TOLERANCE_SECONDS
+    ]
+
+
+def test_fixture_index_similar_fixtures_ranks_shared_trigrams_then_closest_kickoff():
+    far = make_fixture(1, 'far', 'Juventus', 'Inter', kickoff=KICKOFF + timedelta(hours=6))
+    near = make_fixture(2, 'near', 'Juventus', 'Inter', kickoff=KICKOFF + timedelta(hours=1))
+    other = make_fixture(3, 'other', 'Juventus U23', 'Pro Vercelli')
+    fixture_index = FixtureIndex(FakeMatchesCollection([far, near, other]))
+
+    assert fixture_index.similar_fixtures(SOCCER, 'Juventus', 'Inter', timestamp=KICKOFF) == [near, far, other]
+    assert fixture_index.similar_fixtures(
+        SOCCER, 'Juventus', 'Inter', timestamp=KICKOFF, max_kickoff_difference_seconds=2 * 60 * 60
+    ) == [near, other]
+    assert fixture_index.similar_fixtures(SOCCER, 'Juventus', 'Inter', top_k=1, timestamp=KICKOFF) == [near]
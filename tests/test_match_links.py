@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+from pymongo import DeleteOne
+
+from helper import BackgroundBulkWriter, MatchLinkCache, fixture_signature
+
+KICKOFF = datetime.now(pytz.UTC).replace(microsecond=0) + timedelta(days=1)
+WINDOW_START = KICKOFF - timedelta(days=2)
+
+
+class FakeLinksCollection:
+    """match_links stand-in recording the queries, indexes and writes of a MatchLinkCache"""
+
+    name = 'match_links'
+
+    def __init__(self, links=()):
+        self.links = list(links)
+        self.indexes = []
+        self.deleted_filters = []
+        self.find_filters = []
+        self.written_operations = []
+
+    def create_index(self, keys, **kwargs):
+        self.indexes.append((keys, kwargs))
+
+    def delete_many(self, delete_filter):
+        self.deleted_filters.append(delete_filter)
+
+    def find(self, find_filter, projection=None):
+        self.find_filters.append(find_filter)
+        return list(self.links)
+
+    def bulk_write(self, operations, ordered=True):
+        self.written_operations.extend(operations)
+
+
+class FakeFixtureIndex:
+    def __init__(self, fixtures):
+        self.fixtures = {fixture['match_id']: fixture for fixture in fixtures}
+
+    def fixture_by_match_id(self, match_id):
+        return self.fixtures.get(match_id)
+
+
+@pytest.fixture(autouse=True)
+def spill_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(BackgroundBulkWriter, 'SPILL_DIRECTORY', str(tmp_path))
+
+
+def make_fixture(match_id, kickoff=KICKOFF):
+    return {'match_id': match_id, 'competitor1': 'Juventus', 'competitor2': 'Inter', 'timestamp': kickoff}
+
+
+def test_only_links_of_fixtures_in_the_window_are_loaded():
+    links_collection = FakeLinksCollection()
+    match_links = MatchLinkCache(links_collection, 'tipico', window_start=WINDOW_START)
+    match_links.close()
+
+    assert links_collection.find_filters == [{'bookmaker': 'tipico', 'kickoff': {'$gte': WINDOW_START}}]
+    assert ('kickoff', {'expireAfterSeconds': int(MatchLinkCache.LINK_MAX_AGE.total_seconds())}) \
+        in links_collection.indexes
+    assert links_collection.deleted_filters == [{'bookmaker': 'tipico', 'kickoff': {'$exists': False}}]
+
+
+def test_links_are_written_with_their_fixture_kickoff():
+    links_collection = FakeLinksCollection()
+    match_links = MatchLinkCache(links_collection, 'tipico', window_start=WINDOW_START)
+    match_links.link('event-1', make_fixture('a'), score=95.0, margin=10.0)
+    match_links.close()
+
+    operation, = links_collection.written_operations
+    assert operation._filter == {'bookmaker': 'tipico', 'event_id': 'event-1'}
+    assert operation._doc['$set']['kickoff'] == KICKOFF
+    assert operation._doc['$set']['signature'] == fixture_signature(make_fixture('a'))
+
+
+def test_a_link_whose_fixture_changed_is_expired():
+    fixture = make_fixture('a')
+    links_collection = FakeLinksCollection(
+        [{'event_id': 'event-1', 'match_id': 'a', 'signature': fixture_signature(fixture)}]
+    )
+    match_links = MatchLinkCache(links_collection, 'tipico', window_start=WINDOW_START)
+
+    assert match_links.lookup('event-1', FakeFixtureIndex([fixture])) is fixture
+    moved_fixture = make_fixture('a', kickoff=KICKOFF + timedelta(hours=1))
+    assert match_links.lookup('event-1', FakeFixtureIndex([moved_fixture])) is None
+    match_links.close()
+
+    operation, = links_collection.written_operations
+    assert isinstance(operation, DeleteOne)
+    assert operation._filter == {'bookmaker': 'tipico', 'event_id': 'event-1'}
+    assert match_links.expired == 1
@@ -0,0 +1,181 @@
+from datetime import datetime, timedelta
+
+import pytz
+
+from helper import PriceHashCache, fixture_price_update
+
+KICKOFF = datetime.now(pytz.UTC) + timedelta(days=1)
+# {header: {market: {line: {outcome: price}}}}, lines below the market level may contain '.'
+PRICES = {
+    'Full Time': {
+        '3-way': {'': {'1': 1.8, 'x': 3.4, '2': 4.2}},
+        'over-under': {'2.5': {'over': 1.9, 'under': 1.9}, '3.5': {'over': 2.9, 'under': 1.4}},
+    },
+    '1st Half': {'3-way': {'': {'1': 2.4, 'x': 2.1, '2': 4.8}}},
+}
+
+
+class FakeMatchesCollection:
+    """matches_data stand-in returning the stored documents to PriceHashCache"""
+
+    def __init__(self, documents=()):
+        self.documents = list(documents)
+
+    def find(self, query, projection=None):
+        return list(self.documents)
+
+
+def stored_document(match_id, prices, event_id='event-1', bookmaker='tipico'):
+    return {
+        'match_id': match_id,
+        'price_hashes': {bookmaker: PriceHashCache.price_hashes(prices)},
+        f'{bookmaker}_match_id': event_id,
+    }
+
+
+def price_hash_cache(*documents):
+    return PriceHashCache(FakeMatchesCollection(documents), 'tipico')
+
+
+def assert_full_update(operation, match_id, prices, event_id='event-1'):
+    update_filter, update_document = operation._filter, operation._doc
+    new_hashes = update_document['$set']['price_hashes.tipico']
+    assert update_filter['match_id'] == match_id
+    assert update_filter['price_hashes.tipico.hash'] == {'$ne': new_hashes['hash']}
+    assert update_filter['$or'] == [
+        {'price_hashes.tipico.writtenAt': {'$exists': False}},
+        {'price_hashes.tipico.writtenAt': {'$lt': new_hashes['writtenAt']}},
+    ]
+    assert update_document == {'$set': {
+        'prices.tipico': prices, 'price_hashes.tipico': new_hashes, 'tipico_match_id': event_id
+    }}
+
+
+def test_without_a_stored_hash_the_whole_tree_is_written():
+    cache = price_hash_cache()
+
+    operations = cache.diff_update('a', 'event-1', PRICES)
+
+    assert len(operations) == 1
+    assert_full_update(operations[0], 'a', PRICES)
+    assert cache.full_count == 1
+
+
+def test_unchanged_prices_are_skipped():
+    cache = price_hash_cache(stored_document('a', PRICES))
+
+    assert cache.diff_update('a', 'event-1', PRICES) == []
+    assert cache.skipped_count == 1
+
+
+def test_a_new_event_id_is_written_even_with_unchanged_prices():
+    cache = price_hash_cache(stored_document('a', PRICES))
+
+    diff_operation, full_operation = cache.diff_update('a', 'event-2', PRICES)
+
+    assert diff_operation._doc['$set']['tipico_match_id'] == 'event-2'
+    assert not any(field.startswith('prices.') for field in diff_operation._doc['$set'])
+    assert '$unset' not in diff_operation._doc
+    assert_full_update(full_operation, 'a', PRICES, event_id='event-2')
+
+
+def test_only_changed_markets_are_set():
+    previous_hashes = PriceHashCache.price_hashes(PRICES)
+    cache = price_hash_cache(stored_document('a', PRICES))
+    over_under = {'2.5': {'over': 1.8, 'under': 2.0}, '3.5': PRICES['Full Time']['over-under']['3.5']}
+    prices = {**PRICES, 'Full Time': {**PRICES['Full Time'], 'over-under': over_under}}
+
+    diff_operation, full_operation = cache.diff_update('a', 'event-1', prices)
+
+    update_set = diff_operation._doc['$set']
+    new_hashes = update_set.pop('price_hashes.tipico')
+    assert update_set == {
+        'prices.tipico.Full Time.over-under': over_under, 'tipico_match_id': 'event-1'
+    }
+    assert new_hashes['hash'] == PriceHashCache.price_hashes(prices)['hash']
+    assert diff_operation._filter == {
+        'match_id': 'a',
+        'price_hashes.tipico.hash': previous_hashes['hash'],
+        'price_hashes.tipico.writtenAt': {'$lt': new_hashes['writtenAt']},
+    }
+    assert_full_update(full_operation, 'a', prices)
+    assert cache.diffed_count == 1
+
+
+def test_removed_markets_and_headers_are_unset():
+    cache = price_hash_cache(stored_document('a', PRICES))
+    prices = {'Full Time': {'3-way': PRICES['Full Time']['3-way']}}
+
+    diff_operation, full_operation = cache.diff_update('a', 'event-1', prices)
+
+    assert diff_operation._doc['$unset'] == {
+        'prices.tipico.Full Time.over-under': '', 'prices.tipico.1st Half': ''
+    }
+    assert set(diff_operation._doc['$set']) == {'price_hashes.tipico', 'tipico_match_id'}
+    assert_full_update(full_operation, 'a', prices)
+
+
+def test_a_header_that_is_not_a_dict_is_set_whole():
+    previous_prices = {**PRICES, 'winner': 1.5}
+    cache = price_hash_cache(stored_document('a', previous_prices))
+    prices = {**PRICES, 'winner': 1.6}
+
+    diff_operation, _ = cache.diff_update('a', 'event-1', prices)
+
+    assert diff_operation._doc['$set']['prices.tipico.winner'] == 1.6
+    assert 'prices.tipico.Full Time.3-way' not in diff_operation._doc['$set']
+
+
+def test_keys_unusable_in_update_paths_fall_back_to_the_whole_tree():
+    previous_prices = {**PRICES, 'Handicap': {'handicap-0.5': {'': {'1': 1.9, '2': 1.9}}}}
+    cache = price_hash_cache(stored_document('a', previous_prices), stored_document('b', PRICES))
+    dotted_prices = {**PRICES, 'Handicap': {'handicap-1.5': {'': {'1': 2.6, '2': 1.5}}}}
+    dollar_prices = {**PRICES, '$total': {'over-under': {'2.5': {'over': 1.9, 'under': 1.9}}}}
+
+    dotted_operations = cache.diff_update('a', 'event-1', dotted_prices)
+    dollar_operations = cache.diff_update('b', 'event-1', dollar_prices)
+
+    assert len(dotted_operations) == 1
+    assert_full_update(dotted_operations[0], 'a', dotted_prices)
+    assert len(dollar_operations) == 1
+    assert_full_update(dollar_operations[0], 'b', dollar_prices)
+    assert cache.full_count == 2
+
+
+def test_hashes_are_not_recorded_ahead_of_the_write():
+    cache = price_hash_cache()
+
+    assert len(cache.diff_update('a', 'event-1', PRICES)) == 1
+    assert len(cache.diff_update('a', 'event-1', PRICES)) == 1
+    assert cache.skipped_count == 0
+
+
+def test_fixture_price_update_without_hashes_writes_the_whole_tree():
+    operation, = fixture_price_update('tipico', 'event-1', PRICES, {'match_id': 'a'})
+
+    assert operation._filter == {'match_id': 'a'}
+    assert operation._doc == {'$set': {'prices.tipico': PRICES, 'tipico_match_id': 'event-1'}}
+
+
+def test_fixture_price_update_with_hashes_skips_unchanged_prices():
+    cache = price_hash_cache(stored_document('a', PRICES))
+
+    assert fixture_price_update('tipico', 'event-1', PRICES, {'match_id': 'a'}, price_hashes=cache) == []
+
+
+def test_a_missing_price_tree_removes_the_stored_markets():
+    cache = price_hash_cache(stored_document('a', PRICES))
+
+    diff_operation, full_operation = cache.diff_update('a', 'event-1', None)
+
+    assert diff_operation._doc['$unset'] == {'prices.tipico.Full Time': '', 'prices.tipico.1st Half': ''}
+    assert diff_operation._doc['$set']['price_hashes.tipico']['hash'] == PriceHashCache.price_hashes({})['hash']
+    assert_full_update(full_operation, 'a', {})
+
+
+def test_a_missing_price_tree_without_a_stored_hash_writes_an_empty_tree():
+    cache = price_hash_cache()
+
+    operation, = fixture_price_update('tipico', 'event-1', None, {'match_id': 'a'}, price_hashes=cache)
+
+    assert_full_update(operation, 'a', {})